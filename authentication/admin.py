@@ -1,7 +1,14 @@
 from django.contrib import admin
-from .models import UserToken
+from .models import UserToken, OutboxEmail
 
 class UserTokenAdmin(admin.ModelAdmin):
     readonly_fields = ('user', 'token', 'created_at', 'used')
 
-admin.site.register(UserToken, UserTokenAdmin)
\ No newline at end of file
+admin.site.register(UserToken, UserTokenAdmin)
+
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    list_filter = ('status',)
+    readonly_fields = ('subject', 'body', 'from_email', 'to', 'attempts', 'last_error', 'created_at', 'sent_at')
+
+admin.site.register(OutboxEmail, OutboxEmailAdmin)
\ No newline at end of file
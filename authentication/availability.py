@@ -0,0 +1,51 @@
+import hashlib
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models.functions import Upper
+from validate_email import validate_email
+from balance import metrics
+
+AVAILABILITY_CACHE_TIMEOUT = 30
+
+
+def is_taken(field, value, use_cache=True):
+    """
+    Whether a user already has this username or email, compared case
+    insensitively through the UPPER() expression indexes on auth_user.
+    Answers are cached briefly per normalized value, as the registration
+    form asks again on every keystroke.
+    """
+    normalized = value.strip().upper()
+    key = f'availability:{field}:{hashlib.md5(normalized.encode()).hexdigest()}'
+    if use_cache:
+        taken = cache.get(key)
+        metrics.record_cache('availability', taken is not None)
+        if taken is not None:
+            return taken
+
+    taken = User.objects.annotate(normalized=Upper(field)).filter(normalized=normalized).exists()
+    cache.set(key, taken, AVAILABILITY_CACHE_TIMEOUT)
+    return taken
+
+
+def mark_taken(field, value):
+    normalized = value.strip().upper()
+    cache.set(f'availability:{field}:{hashlib.md5(normalized.encode()).hexdigest()}', True, AVAILABILITY_CACHE_TIMEOUT)
+
+
+def username_error(username):
+    """(error message, status) for an unusable username, or None."""
+    if not str(username).isalnum():
+        return 'Username should only contain alphanumeric characters', 400
+    if is_taken('username', username):
+        return 'Username is used, please choose another one', 409
+    return None
+
+
+def email_error(email):
+    """(error message, status) for an unusable email, or None."""
+    if not validate_email(email):
+        return 'Email is invalid', 400
+    if is_taken('email', email):
+        return 'Email is used, please choose another one', 409
+    return None
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# Backends whose entries live in a single process, or nowhere
+UNSHARED_CACHES = ('django.core.cache.backends.locmem.LocMemCache', 'django.core.cache.backends.dummy.DummyCache')
+
+
+@register(Tags.caches, deploy=True)
+def throttle_cache_check(app_configs, **kwargs):
+    backend = settings.CACHES.get(settings.THROTTLE_CACHE, {}).get('BACKEND')
+    if backend is None:
+        return [Error(f"THROTTLE_CACHE names the cache '{settings.THROTTLE_CACHE}', which is not in CACHES",
+                      id='authentication.E002')]
+    if backend in UNSHARED_CACHES:
+        return [Error(
+            f"The throttle cache '{settings.THROTTLE_CACHE}' uses {backend.rsplit('.', 1)[-1]}, which is not shared",
+            hint='Point THROTTLE_CACHE at a Redis, Memcached or database cache so every worker counts the same '
+                 'attempts.',
+            id='authentication.E001',
+        )]
+    return []
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+from authentication.models import UserToken
+from authentication.utils import token_ttl
+
+
+class Command(BaseCommand):
+    help = 'Delete used and expired activation / reset tokens in bounded batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        stale = UserToken.objects.filter(Q(used=True) | Q(created_at__lt=timezone.now() - token_ttl()))
+        deleted = 0
+        while True:
+            # Short DELETEs by primary key keep locks and the transaction log small
+            ids = list(stale.values_list('id', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            deleted += UserToken.objects.filter(id__in=ids).delete()[0]
+
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} tokens'))
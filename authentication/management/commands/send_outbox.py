@@ -0,0 +1,23 @@
+import time
+from django.core.management.base import BaseCommand
+from authentication.outbox import drain_outbox, MAX_ATTEMPTS
+
+
+class Command(BaseCommand):
+    help = 'Send queued outbox emails in batches over one mail server connection'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--max-attempts', type=int, default=MAX_ATTEMPTS,
+                            help='Dead-letter an email after this many failed attempts')
+        parser.add_argument('--loop', action='store_true', help='Keep polling instead of exiting once drained')
+        parser.add_argument('--interval', type=float, default=5, help='Seconds between polls with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = drain_outbox(options['batch_size'], options['max_attempts'])
+            if sent or failed or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(f'Sent {sent} emails, {failed} failed'))
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
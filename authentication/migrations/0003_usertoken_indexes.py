@@ -0,0 +1,23 @@
+# Generated by Django 5.0.7 on 2026-10-18 13:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0002_outboxemail'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='usertoken',
+            index=models.Index(fields=['user', 'token', 'used'], name='usertoken_lookup_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usertoken',
+            index=models.Index(fields=['created_at'], name='usertoken_created_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('authentication', '0003_usertoken_indexes'),
+    ]
+
+    # Case-insensitive lookups of authentication.availability.is_taken
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX auth_user_username_upper_idx ON auth_user (UPPER(username));',
+            'DROP INDEX auth_user_username_upper_idx;',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX auth_user_email_upper_idx ON auth_user (UPPER(email));',
+            'DROP INDEX auth_user_email_upper_idx;',
+        ),
+    ]
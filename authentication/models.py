@@ -8,6 +8,43 @@ class UserToken(models.Model):
     token = models.CharField(max_length=255, unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
     used = models.BooleanField(default=False)
-    
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'token', 'used'], name='usertoken_lookup_idx'),
+            models.Index(fields=['created_at'], name='usertoken_created_idx'),
+        ]
+
     def __str__(self):
         return self.token
+
+
+class OutboxEmail(models.Model):
+    """
+    An email waiting for the send_outbox worker. Failed deliveries are
+    retried with exponential backoff until they run out of attempts and
+    are dead-lettered for inspection in the admin.
+    """
+    QUEUED = 'queued'
+    SENT = 'sent'
+    DEAD = 'dead'
+    STATUS_CHOICES = [(QUEUED, 'Queued'), (SENT, 'Sent'), (DEAD, 'Dead')]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255, blank=True)
+    to = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(auto_now_add=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_status_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)} ({self.status})"
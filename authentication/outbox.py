@@ -0,0 +1,101 @@
+import datetime
+import logging
+import smtplib
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+from .models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 6
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 60 * 60
+
+
+def queue_email(subject, body, from_email, to):
+    """Store an email for the send_outbox worker. Cheap enough to call inside a request."""
+    return OutboxEmail.objects.create(subject=subject, body=body, from_email=from_email or '', to=list(to))
+
+
+def backoff(attempts):
+    return datetime.timedelta(seconds=min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS))
+
+
+def reconnect(connection):
+    connection.close()
+    try:
+        connection.open()
+    except Exception as error:
+        logger.warning('Could not reconnect to the mail server: %s', error)
+        return False
+    return True
+
+
+def deliver_batch(connection, batch_size=50, max_attempts=MAX_ATTEMPTS):
+    """
+    Send up to `batch_size` due emails over one open backend connection.
+    Rows are locked for the duration so concurrent workers skip them.
+    Returns (sent, failed).
+    """
+    sent = failed = 0
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(OutboxEmail.objects
+                     .select_for_update(skip_locked=True)
+                     .filter(status=OutboxEmail.QUEUED, next_attempt_at__lte=now)
+                     .order_by('next_attempt_at', 'id')[:batch_size])
+
+        processed = []
+        for outbox_email in batch:
+            message = EmailMessage(outbox_email.subject, outbox_email.body,
+                                   outbox_email.from_email or None, outbox_email.to, connection=connection)
+            processed.append(outbox_email)
+            try:
+                message.send()
+            except Exception as error:
+                disconnected = isinstance(error, smtplib.SMTPServerDisconnected)
+                failed += 1
+                outbox_email.attempts += 1
+                outbox_email.last_error = f'{type(error).__name__}: {error}'
+                if outbox_email.attempts >= max_attempts:
+                    outbox_email.status = OutboxEmail.DEAD
+                    logger.error('Dead-lettered outbox email %s: %s', outbox_email.id, outbox_email.last_error)
+                else:
+                    outbox_email.next_attempt_at = now + backoff(outbox_email.attempts)
+                if disconnected and not reconnect(connection):
+                    # The rest of the batch stays queued for the next run
+                    break
+            else:
+                sent += 1
+                outbox_email.attempts += 1
+                outbox_email.status = OutboxEmail.SENT
+                outbox_email.sent_at = timezone.now()
+                outbox_email.last_error = ''
+
+        OutboxEmail.objects.bulk_update(processed, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at'])
+    return sent, failed
+
+
+def drain_outbox(batch_size=50, max_attempts=MAX_ATTEMPTS):
+    """
+    Send every due email, batch after batch, over a single connection.
+    An unreachable mail server sends nothing and leaves the queue as is.
+    """
+    total_sent = total_failed = 0
+    if not OutboxEmail.objects.filter(status=OutboxEmail.QUEUED, next_attempt_at__lte=timezone.now()).exists():
+        return total_sent, total_failed
+
+    connection = get_connection(fail_silently=False)
+    if not reconnect(connection):
+        # Everything stays queued; the worker tries again on its next poll
+        return total_sent, total_failed
+    try:
+        while True:
+            sent, failed = deliver_batch(connection, batch_size, max_attempts)
+            total_sent += sent
+            total_failed += failed
+            if sent + failed < batch_size:
+                return total_sent, total_failed
+    finally:
+        connection.close()
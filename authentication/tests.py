@@ -1,3 +1,52 @@
-from django.test import TestCase
+from django.core.cache import caches
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase, RequestFactory, override_settings
+from .models import OutboxEmail
+from .outbox import drain_outbox, queue_email
+from .throttle import THROTTLE_RATES, allow, client_ip
 
-# Create your tests here.
+
+class ThrottleTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.factory = RequestFactory()
+
+    def request(self, ip, forwarded_for=None):
+        extra = {'HTTP_X_FORWARDED_FOR': forwarded_for} if forwarded_for else {}
+        return self.factory.post('/authentication/login', REMOTE_ADDR=ip, **extra)
+
+    def test_forwarded_for_is_ignored_without_trusted_proxies(self):
+        self.assertEqual(client_ip(self.request('10.0.0.1', '1.2.3.4')), '10.0.0.1')
+
+    @override_settings(THROTTLE_TRUSTED_PROXIES=1)
+    def test_forwarded_for_entries_before_the_trusted_proxies_are_ignored(self):
+        self.assertEqual(client_ip(self.request('10.0.0.1', '6.6.6.6, 1.2.3.4')), '1.2.3.4')
+
+    def test_failed_logins_from_elsewhere_do_not_lock_the_owner_out(self):
+        capacity, period = THROTTLE_RATES['login']['identity_ip']
+        for _ in range(capacity):
+            self.assertTrue(allow(self.request('6.6.6.6'), 'login', 'alice'))
+        self.assertFalse(allow(self.request('6.6.6.6'), 'login', 'Alice'))
+        self.assertTrue(allow(self.request('1.2.3.4'), 'login', 'alice'))
+
+
+class UnreachableBackend(EmailBackend):
+    def open(self):
+        raise ConnectionRefusedError('mail server down')
+
+
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.email = queue_email('Activate your account', 'Hello', 'noreply@example.com', ['user@example.com'])
+
+    @override_settings(EMAIL_BACKEND='authentication.tests.UnreachableBackend')
+    def test_unreachable_mail_server_leaves_the_queue_alone(self):
+        self.assertEqual(drain_outbox(), (0, 0))
+        self.email.refresh_from_db()
+        self.assertEqual((self.email.status, self.email.attempts), (OutboxEmail.QUEUED, 0))
+
+    @override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+    def test_due_emails_are_sent(self):
+        self.assertEqual(drain_outbox(), (1, 0))
+        self.email.refresh_from_db()
+        self.assertEqual(self.email.status, OutboxEmail.SENT)
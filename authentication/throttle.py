@@ -0,0 +1,70 @@
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import caches
+
+# (bucket capacity, seconds to refill it completely) per scope and key type.
+# Login attempts on a username are counted per client IP, so guessing a
+# password from elsewhere cannot lock its owner out.
+THROTTLE_RATES = {
+    'login': {'ip': (20, 60), 'identity_ip': (5, 60)},
+    'reset-password': {'ip': (5, 60 * 15), 'identity': (3, 60 * 15)},
+    'validate': {'ip': (60, 60)},
+}
+
+
+def client_ip(request):
+    """
+    The client address. Each of the THROTTLE_TRUSTED_PROXIES proxies in
+    front of the app appends the address it got the request from to
+    X-Forwarded-For, so the client is that many entries from the end and
+    anything before may be forged. Without trusted proxies the header is
+    ignored.
+    """
+    proxies = settings.THROTTLE_TRUSTED_PROXIES
+    forwarded_for = [address.strip() for address in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',')
+                     if address.strip()]
+    if proxies and len(forwarded_for) >= proxies:
+        return forwarded_for[-proxies]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def take_token(key, capacity, period):
+    """
+    Take one token from the bucket stored under `key`, refilled continuously
+    at capacity / period per second. Read-modify-write on the cache, so a
+    burst of concurrent requests may overdraw it slightly.
+    """
+    cache = caches[settings.THROTTLE_CACHE]
+    now = time.time()
+    tokens, stamp = cache.get(key, (capacity, now))
+    tokens = min(capacity, tokens + (now - stamp) * capacity / period)
+    allowed = tokens >= 1
+    if allowed:
+        tokens -= 1
+    # A bucket left alone for a whole period is full again, so it can expire
+    cache.set(key, (tokens, now), period)
+    return allowed
+
+
+def allow(request, scope, identity=None):
+    """
+    Whether a request may go on, drawing from the client IP bucket and, when
+    given, the bucket of the username or email it targets, alone or together
+    with the IP depending on the scope. Call it before any database or
+    password hashing work.
+    """
+    ip = client_ip(request)
+    values = {'ip': ip}
+    if identity:
+        values['identity'] = str(identity).strip().lower()
+        values['identity_ip'] = f"{values['identity']}|{ip}"
+
+    allowed = True
+    for key_type, (capacity, period) in THROTTLE_RATES[scope].items():
+        if key_type not in values:
+            continue
+        value = values[key_type]
+        digest = hashlib.md5(value.encode()).hexdigest()
+        allowed = take_token(f'throttle:{scope}:{key_type}:{digest}', capacity, period) and allowed
+    return allowed
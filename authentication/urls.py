@@ -1,4 +1,4 @@
-from .views import RegistrationView, UsernameValidationView, EmailValidationView, VerificationView, LoginView, LogoutView, ResetPassword, SetNewPassword
+from .views import RegistrationView, UsernameValidationView, EmailValidationView, RegistrationValidationView, VerificationView, LoginView, LogoutView, ResetPassword, SetNewPassword
 from django.urls import path
 from django.views.decorators.csrf import csrf_exempt
 
@@ -9,6 +9,7 @@ urlpatterns = [
     path('reset-password', ResetPassword.as_view(), name='reset-password'),
     path('validate-username', csrf_exempt(UsernameValidationView.as_view()), name="validate-username"),
     path('validate-email',csrf_exempt(EmailValidationView.as_view()), name='validate-email'),
+    path('validate-registration', csrf_exempt(RegistrationValidationView.as_view()), name='validate-registration'),
     path('activate/<uidb64>/<token>', VerificationView.as_view(), name='activate'),
     path('set-newpassword/<uidb64>/<token>', SetNewPassword.as_view(), name='set-newpassword')
 ]
\ No newline at end of file
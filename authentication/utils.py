@@ -1,9 +1,16 @@
 import uuid
+import datetime
+from django.conf import settings
 from django.utils import timezone
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
 from six import text_type
 from .models import UserToken
 
+def token_ttl():
+    """How long an activation or reset token stays valid."""
+    return datetime.timedelta(seconds=settings.PASSWORD_RESET_TIMEOUT)
+
+
 class AppTokenGenerator(PasswordResetTokenGenerator):
     def _make_hash_value(self, user, timestamp):
         return (text_type(user.is_active) + text_type(user.pk) + text_type(timestamp))
@@ -14,14 +21,9 @@ class AppTokenGenerator(PasswordResetTokenGenerator):
         return token
 
     def check_token(self, user, token):
-        try:
-            # Check if the token exists and is not used
-            user_token = UserToken.objects.get(user=user, token=token, used=False)
-            # Mark the token as used
-            user_token.used = True
-            user_token.save()
-            return True
-        except UserToken.DoesNotExist:
-            return False
+        # Mark an unused, unexpired token as used in one UPDATE, so it can only be redeemed once
+        return UserToken.objects.filter(
+            user=user, token=token, used=False, created_at__gte=timezone.now() - token_ttl()
+        ).update(used=True) == 1
 
 token_generator = AppTokenGenerator()
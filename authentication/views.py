@@ -3,54 +3,69 @@ from django.views import View
 from django.http import JsonResponse
 from django.contrib.auth.models import User
 import json
-from validate_email import validate_email
 from django.contrib import messages, auth
-from django.core.mail import EmailMessage
 from django.urls import reverse
 from django.utils.encoding import force_bytes, force_str, DjangoUnicodeDecodeError
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.contrib.sites.shortcuts import get_current_site
 from .utils import token_generator
+from .outbox import queue_email
+from .throttle import allow
+from .availability import is_taken, mark_taken, username_error, email_error
+from userpreferences.models import UserPreferences
 from django.shortcuts import render, redirect
 from django.contrib.auth import authenticate, login as auth_login
-import threading
 
-class EmailThread(threading.Thread):
-    def __init__(self, email):
-        self.email = email
-        threading.Thread.__init__(self)
 
-    def run(self):
-        self.email.send(fail_silently=False)
+THROTTLED_MESSAGE = 'Too many attempts, please wait a moment and try again.'
 
 
 class EmailValidationView(View):
     def post(self, request):
-        data=json.loads(request.body)
-        email = data['email']
+        if not allow(request, 'validate'):
+            return JsonResponse({'email_error': THROTTLED_MESSAGE}, status=429)
 
-        if not validate_email(email):
-            return JsonResponse({'email_error':'Email is invalid'}, status=400)
-    
-        if User.objects.filter(email=email).exists():
-            return JsonResponse({'email_error':'Email is used, please choose another one'}, status=409)
+        data=json.loads(request.body)
+        error = email_error(data['email'])
+        if error:
+            message, status = error
+            return JsonResponse({'email_error': message}, status=status)
 
         return JsonResponse({'email_valid': True})
 
 
 class UsernameValidationView(View):
     def post(self, request):
-        data=json.loads(request.body)
-        username = data['username']
+        if not allow(request, 'validate'):
+            return JsonResponse({'username_error': THROTTLED_MESSAGE}, status=429)
 
-        if not str(username).isalnum():
-            return JsonResponse({'username_error':'Username should only contain alphanumeric characters'}, status=400)
-    
-        if User.objects.filter(username=username).exists():
-            return JsonResponse({'username_error':'Username is used, please choose another one'}, status=409)
+        data=json.loads(request.body)
+        error = username_error(data['username'])
+        if error:
+            message, status = error
+            return JsonResponse({'username_error': message}, status=status)
 
         return JsonResponse({'username_valid': True})
 
+
+class RegistrationValidationView(View):
+    """Check the username and the email of the registration form in one request."""
+    def post(self, request):
+        if not allow(request, 'validate'):
+            return JsonResponse({'username_error': THROTTLED_MESSAGE, 'email_error': THROTTLED_MESSAGE}, status=429)
+
+        data=json.loads(request.body)
+        result = {}
+        for field, check in (('username', username_error), ('email', email_error)):
+            if data.get(field):
+                error = check(data[field])
+                if error:
+                    result[f'{field}_error'] = error[0]
+                else:
+                    result[f'{field}_valid'] = True
+
+        return JsonResponse(result)
+
 class RegistrationView(View):
     def get(self, request):
         return render(request, 'authentication/register.html')
@@ -64,8 +79,8 @@ class RegistrationView(View):
             'fieldValues': request.POST
         }
 
-        if not User.objects.filter(username=username).exists():
-            if not User.objects.filter(email=email).exists():
+        if not is_taken('username', username, use_cache=False):
+            if not is_taken('email', email, use_cache=False):
                 if len(password)<6:
                     messages.error(request, "The password is too short!")
                     return render(request, 'authentication/register.html', context)
@@ -74,6 +89,9 @@ class RegistrationView(View):
                 user.set_password(password)
                 user.is_active = False
                 user.save()
+                UserPreferences.objects.create(user=user)
+                mark_taken('username', username)
+                mark_taken('email', email)
 
                 uidb64 = urlsafe_base64_encode(force_bytes(user.pk))
                 domain = get_current_site(request).domain
@@ -81,14 +99,13 @@ class RegistrationView(View):
                                                     'token':token_generator.generate_token(user)})
                 activate_url= f'http://{domain}{link}'
 
-                email = EmailMessage(
+                # Delivered by the send_outbox worker
+                queue_email(
                     'FinanceWebApp - Activate your account',
                     f'Hello {username}!, please activate your user by clicking here:/n {activate_url}',
                     'franciscocucullu@gmail.com',
                     [email]
                     )
-
-                EmailThread(email).start()
                 
                 
                 messages.success(request, "Account successfully created! Check your email to activate your user")
@@ -132,6 +149,11 @@ class LoginView(View):
         password = request.POST.get('password')
         next_url = request.POST.get('next', '/')  # Get the 'next' parameter from the form
 
+        # Refuse floods before the user lookup and the password hash
+        if not allow(request, 'login', username):
+            messages.error(request, THROTTLED_MESSAGE)
+            return render(request, 'authentication/login.html', {'next': next_url}, status=429)
+
         if username and password:
             try:
                 user = User.objects.get(username=username)
@@ -170,6 +192,10 @@ class ResetPassword(View):
     def post(self, request):
         email = request.POST.get('email')
         context = {'fieldValues': request.POST}  
+
+        if not allow(request, 'reset-password', email):
+            messages.error(request, THROTTLED_MESSAGE)
+            return render(request, 'authentication/reset-password.html', context, status=429)
         user = User.objects.filter(email=email)      
         
         if user:
@@ -189,15 +215,13 @@ class ResetPassword(View):
                 "FinanceWebApp Team"
             )
 
-            email_object = EmailMessage(
+            queue_email(
                 'FinanceWebApp - Reset password link',
                 email_body,
                 'franciscocucullu@gmail.com',
                 [email]
                 )
 
-            EmailThread(email_object).start()
-
 
         if len(email) > 0 :
             messages.success(request, 'If this email is registered, we have sent you a reset link there.')
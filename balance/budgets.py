@@ -0,0 +1,68 @@
+import datetime
+from decimal import Decimal
+from django.contrib import messages
+from django.db import transaction
+from .models import Budget, display_currency
+from .rollups import period_totals, next_month
+
+
+def period_bounds(period, date):
+    """First and last day of the month or year holding `date`."""
+    if period == 'year':
+        return date.replace(month=1, day=1), date.replace(month=12, day=31)
+    start = date.replace(day=1)
+    return start, next_month(start) - datetime.timedelta(days=1)
+
+
+def refresh_budgets(user, currency, budgets, today=None):
+    """
+    Move budgets to the period holding today and recount what was spent in
+    it, from the monthly rollup plus the days of the current month. Needed
+    once per period and after bulk writes that bypass apply_expense.
+    """
+    today = today or datetime.date.today()
+    totals = {}
+    for budget in budgets:
+        budget.period_start, budget.period_end = period_bounds(budget.period, today)
+        bounds = (budget.period_start, budget.period_end)
+        if bounds not in totals:
+            totals[bounds] = period_totals(user, 'expense', budget.period_start, budget.period_end, currency)
+        budget.spent = totals[bounds].get((budget.category,), [Decimal('0')])[0]
+    Budget.objects.bulk_update(budgets, ['period_start', 'period_end', 'spent'])
+    return budgets
+
+
+def refresh_all_budgets(users=None):
+    """
+    refresh_budgets for every user with budgets, or those among `users`,
+    after the rollups or rates they are counted from changed. Each user's
+    budgets are locked while recounted, so a concurrent apply_expense lands
+    on top of the new figure. Returns how many users were refreshed.
+    """
+    budgets = Budget.objects.all() if users is None else Budget.objects.filter(user__in=users)
+    user_ids = list(budgets.order_by().values_list('user_id', flat=True).distinct())
+    for user_id in user_ids:
+        with transaction.atomic():
+            refresh_budgets(user_id, display_currency(user_id),
+                            list(Budget.objects.select_for_update().filter(user=user_id)))
+    return len(user_ids)
+
+
+def current_budgets(user, currency, today=None):
+    """Every budget of a user from one query, rolling over those whose period has ended."""
+    today = today or datetime.date.today()
+    budgets = list(Budget.objects.filter(user=user).order_by('category', 'period'))
+    stale = [budget for budget in budgets if not budget.period_start <= today <= budget.period_end]
+    if stale:
+        refresh_budgets(user, currency, stale, today)
+    return budgets
+
+
+def warn_over_budget(request, category):
+    """Flash a warning for every budget of `category` that is now overrun."""
+    today = datetime.date.today()
+    for budget in Budget.objects.filter(user=request.user, category=category,
+                                        period_start__lte=today, period_end__gte=today):
+        if budget.is_over:
+            messages.warning(request, f'{budget.get_period_display()} budget for {category} exceeded: '
+                                      f'{budget.spent} of {budget.amount} spent')
@@ -0,0 +1,62 @@
+from decimal import Decimal
+from django.db import transaction
+from django.utils import timezone
+from userpreferences.currencies import rates
+from userpreferences.models import DataVersion
+from .models import Balance, Budget, MonthlyRollup, DeletedTransaction, stamp_sync_versions
+from .budgets import refresh_budgets
+from .rollups import KIND_MODELS
+
+# Rows one bulk action may touch, so the id list stays a single statement
+BULK_ACTION_LIMIT = 5000
+ROLLUP_FIELDS = ('id', 'owner', 'date', 'amount', 'category', 'account', 'currency')
+
+
+def locked_rows(user, kind, ids):
+    """The user's rows among `ids`, locked and with only what the rollup needs."""
+    model = KIND_MODELS[kind]
+    return list(model.objects.select_for_update().filter(owner=user, id__in=ids).only(*ROLLUP_FIELDS))
+
+
+def bulk_delete(user, kind, ids, currency):
+    """
+    Delete the user's rows among `ids` with one DELETE, take them out of the
+    monthly rollup and move the balance once. Returns how many went.
+    """
+    model = KIND_MODELS[kind]
+    with transaction.atomic():
+        rows = locked_rows(user, kind, ids)
+        if not rows:
+            return 0
+        amount = sum((rates.convert(row.amount, row.currency, currency, row.date) for row in rows), Decimal('0'))
+        DeletedTransaction.record(rows)
+        model.objects.filter(owner=user, id__in=[row.id for row in rows]).delete()
+        MonthlyRollup.record(rows, sign=-1)
+        Balance.apply_delta(user, **{'expenses' if kind == 'expense' else 'incomes': -amount})
+        if kind == 'expense':
+            refresh_budgets(user, currency, list(Budget.objects.filter(user=user)))
+    return len(rows)
+
+
+def bulk_recategorize(user, kind, ids, category, currency):
+    """
+    Move the user's rows among `ids` to `category` with one UPDATE and shift
+    their rollup months accordingly. Totals do not change, only the data
+    version does. Returns how many rows moved.
+    """
+    model = KIND_MODELS[kind]
+    with transaction.atomic():
+        rows = [row for row in locked_rows(user, kind, ids) if row.category != category]
+        if not rows:
+            return 0
+        model.objects.filter(owner=user, id__in=[row.id for row in rows]).update(
+            category=category, updated_at=timezone.now(), sync_version=None)
+        MonthlyRollup.record(rows, sign=-1)
+        for row in rows:
+            row.category = category
+        MonthlyRollup.record(rows)
+        DataVersion.bump(getattr(user, 'pk', user))
+        stamp_sync_versions([getattr(user, 'pk', user)])
+        if kind == 'expense':
+            refresh_budgets(user, currency, list(Budget.objects.filter(user=user)))
+    return len(rows)
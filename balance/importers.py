@@ -0,0 +1,147 @@
+import csv
+import datetime
+import re
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+from expenses.models import Expense
+from incomes.models import Income
+from .models import Balance, MonthlyRollup, Budget
+from .budgets import refresh_budgets
+
+IMPORT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%Y%m%d')
+OFX_FIELD = re.compile(r'<(\w+)>([^<\r\n]*)')
+
+
+class ImportResult:
+    def __init__(self):
+        self.expenses = 0
+        self.incomes = 0
+        self.error_count = 0
+        self.errors = []
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f'Line {line}: {message}')
+
+
+def read_csv_rows(stream):
+    """Yield (line number, row) from a CSV with a header row, one line at a time."""
+    reader = csv.DictReader(stream)
+    if reader.fieldnames:
+        reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+    for row in reader:
+        yield reader.line_num, row
+
+
+def read_ofx_rows(stream):
+    """
+    Yield (line number, row) for every <STMTTRN> of an OFX statement. Handles
+    both the SGML (unclosed tags) and the XML flavours, one line at a time.
+    """
+    row = None
+    start = 0
+    for line_number, line in enumerate(stream, start=1):
+        upper = line.upper()
+        if '<STMTTRN>' in upper:
+            row, start = {}, line_number
+        if row is not None:
+            for tag, value in OFX_FIELD.findall(line):
+                row[tag.lower()] = value.strip()
+        if '</STMTTRN>' in upper and row is not None:
+            yield start, {
+                'date': row.get('dtposted', '')[:8],
+                'description': row.get('name') or row.get('memo', ''),
+                'amount': row.get('trnamt', ''),
+            }
+            row = None
+
+
+def parse_date(value):
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(value.strip(), date_format).date()
+        except ValueError:
+            continue
+    return None
+
+
+def build_transaction(user, row, kind, preferences, defaults):
+    """Return (model instance, None) for a valid row or (None, error message)."""
+    date = parse_date(row.get('date') or '')
+    if date is None:
+        return None, f"invalid date '{row.get('date', '')}'"
+
+    try:
+        amount = Decimal((row.get('amount') or '').replace(',', '.')).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        return None, f"invalid amount '{row.get('amount', '')}'"
+
+    row_kind = (row.get('type') or row.get('kind') or kind).strip().lower()
+    if row_kind == 'signed':
+        row_kind = 'expense' if amount < 0 else 'income'
+    if row_kind not in ('expense', 'income'):
+        return None, f"unknown type '{row_kind}'"
+    amount = abs(amount)
+    if amount == 0:
+        return None, 'amount is zero'
+
+    categories = preferences.categories_expenses if row_kind == 'expense' else preferences.categories_incomes
+    category = (row.get('category') or defaults.get(row_kind) or '').strip()
+    if category not in categories:
+        return None, f"unknown {row_kind} category '{category}'"
+
+    account = (row.get('account') or defaults.get('account') or '').strip()
+    if account not in preferences.accounts:
+        return None, f"unknown account '{account}'"
+
+    description = (row.get('description') or '').strip()[:50]
+    if not description:
+        return None, 'description is empty'
+
+    model = Expense if row_kind == 'expense' else Income
+    return model(owner=user, date=date, description=description, amount=amount,
+                 category=category, account=account, currency=preferences.currency_code), None
+
+
+def import_transactions(user, rows, kind, preferences, defaults):
+    """
+    Validate and insert rows in IMPORT_BATCH_SIZE bulk_create batches within
+    one transaction, folding each batch into the monthly rollup, then move
+    the balance once. Invalid rows are reported in the result and skipped.
+    """
+    result = ImportResult()
+    batches = {Expense: [], Income: []}
+    totals = {Expense: Decimal('0'), Income: Decimal('0')}
+
+    def flush(model):
+        model.objects.bulk_create(batches[model])
+        MonthlyRollup.record(batches[model])
+        batches[model].clear()
+
+    with transaction.atomic():
+        for line, row in rows:
+            instance, error = build_transaction(user, row, kind, preferences, defaults)
+            if error:
+                result.add_error(line, error)
+                continue
+
+            model = type(instance)
+            batches[model].append(instance)
+            totals[model] += instance.amount
+            if len(batches[model]) >= IMPORT_BATCH_SIZE:
+                flush(model)
+            if model is Expense:
+                result.expenses += 1
+            else:
+                result.incomes += 1
+
+        for model in batches:
+            flush(model)
+        Balance.apply_delta(user, expenses=totals[Expense], incomes=totals[Income])
+        if result.expenses:
+            refresh_budgets(user, preferences.currency_code, list(Budget.objects.filter(user=user)))
+
+    return result
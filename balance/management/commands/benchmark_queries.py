@@ -0,0 +1,78 @@
+import datetime
+import time
+import uuid
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Sum, Count, Avg
+from expenses.models import Expense
+from incomes.models import Income
+from userpreferences.models import UserPreferences
+from balance.search import apply_search
+from balance.seeding import seed
+
+SEARCHES = {'search': 'coffee', 'search_filtered': 'bank >20 2024-01..2025-12', 'search_category': 'food'}
+
+
+class Command(BaseCommand):
+    help = 'Seed a large transaction table and report EXPLAIN plans and timings of the hot queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help='Expenses and incomes seeded in total')
+        parser.add_argument('--users', type=int, default=100, help='Users the rows are spread over')
+        parser.add_argument('--days', type=int, default=5 * 365, help='How far back the dates go')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per query')
+        parser.add_argument('--batch-size', type=int, default=10_000)
+        parser.add_argument('--random-seed', type=int, help='Make the generated data reproducible')
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded data afterwards')
+        parser.add_argument('--confirm', action='store_true',
+                            help='Allow seeding into the configured database, required outside of test databases')
+
+    def handle(self, *args, **options):
+        database = str(connection.settings_dict['NAME'])
+        test_database = database.startswith('test_') or 'mode=memory' in database
+        if not options['confirm'] and not test_database:
+            raise CommandError(f"This writes {options['rows']} rows into the database '{database}', "
+                               "pass --confirm to run it there")
+
+        # A fresh prefix per run, so reruns and kept data never collide
+        prefix = f'benchmark_{uuid.uuid4().hex[:8]}_'
+        started = time.perf_counter()
+        user_ids = seed(options['users'], max(options['rows'] // options['users'], 1), prefix=prefix,
+                        days=options['days'], batch_size=options['batch_size'], random_seed=options['random_seed'])
+        self.stdout.write(f'Seeded {len(user_ids)} users in {time.perf_counter() - started:.1f}s')
+        try:
+            preferences = UserPreferences.objects.get(user_id=user_ids[0])
+            self.report(Expense, user_ids[0], preferences.categories_expenses, preferences.accounts, options['repeat'])
+            self.report(Income, user_ids[0], preferences.categories_incomes, preferences.accounts, options['repeat'])
+        finally:
+            if not options['keep']:
+                for model in (Expense, Income):
+                    model.objects.filter(owner__in=user_ids).delete()
+                User.objects.filter(pk__in=user_ids).delete()
+            else:
+                self.stdout.write(f"Kept the seeded users, their names start with '{prefix}'")
+
+    def report(self, model, user_id, categories, accounts, repeat):
+        start_date = datetime.date.today() - datetime.timedelta(days=365)
+        owned = model.objects.filter(owner=user_id)
+        queries = {
+            'list': owned.order_by('-date', '-id')[:25],
+            **{name: apply_search(owned, text, categories, accounts).order_by('-date', '-id')[:25]
+               for name, text in SEARCHES.items()},
+            'summary': owned.filter(date__gte=start_date).order_by().values('category')
+                            .annotate(total=Sum('amount'), count=Count('id'), mean=Avg('amount')),
+            'account': owned.filter(account='Bank').order_by('-date')[:25],
+        }
+
+        for name, queryset in queries.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{model.__name__} {name}'))
+            self.stdout.write(queryset.explain())
+
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            self.stdout.write(f'p50 {timings[len(timings) // 2]:.2f} ms, max {timings[-1]:.2f} ms')
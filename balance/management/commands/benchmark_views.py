@@ -0,0 +1,118 @@
+import datetime
+import json
+import statistics
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment
+from django.urls import reverse
+from expenses.models import Expense
+from userpreferences.currencies import rates
+from userpreferences.models import DataVersion
+
+READ_SCENARIOS = {
+    'expenses_list': lambda: reverse('expenses'),
+    'expenses_search': lambda: reverse('expenses') + '?search=rent',
+    'expenses_by_category': lambda: reverse('get_expenses_by_category', args=['Year']) + '?calculation_type=all',
+    'dashboard': lambda: reverse('dashboard'),
+    'preferences': lambda: reverse('general-preferences'),
+}
+WRITE_SCENARIOS = ('add_expense', 'edit_expense', 'delete_expense')
+
+
+class QueryRecorder:
+    """connection.execute_wrapper that counts queries, their time and the rows the driver reports."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.rows = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+            self.rows += max(context['cursor'].rowcount, 0)
+
+
+class Command(BaseCommand):
+    help = 'Request the main pages as seeded users and report latency, query counts and rows touched as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=5, help='Seeded users the requests are spread over')
+        parser.add_argument('--prefix', default='seed_', help='Username prefix of the seeded users')
+        parser.add_argument('--repeat', type=int, default=5, help='Requests per scenario and user')
+        parser.add_argument('--warm', action='store_true', help="Keep the users' cached pages between requests")
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        users = list(User.objects.filter(username__startswith=options['prefix']).order_by('id')[:options['users']])
+        if not users:
+            raise CommandError(f"No users starting with '{options['prefix']}', run seed_data first")
+
+        setup_test_environment()
+        self.warm = options['warm']
+        samples = {name: [] for name in [*READ_SCENARIOS, *WRITE_SCENARIOS]}
+        for user in users:
+            client = Client()
+            client.force_login(user)
+            for _ in range(options['repeat']):
+                for name, url in READ_SCENARIOS.items():
+                    samples[name].append(self.measure(user, client.get, url()))
+                self.measure_writes(client, user, samples)
+
+        report = {
+            'users': len(users),
+            'repeat': options['repeat'],
+            'warm_cache': self.warm,
+            'database': connection.vendor,
+            'scenarios': {name: summarize(runs) for name, runs in samples.items()},
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+        else:
+            self.stdout.write(output)
+
+    def measure(self, user, method, url, data=None):
+        if not self.warm:
+            # Only this user's entries go cold: every per-user cache key carries the data version
+            DataVersion.bump(user.id)
+            rates.clear()
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            response = method(url, data) if data is not None else method(url)
+        elapsed = time.perf_counter() - started
+        if response.status_code >= 400:
+            raise CommandError(f'{url} answered {response.status_code}')
+        return {'ms': elapsed * 1000, 'db_ms': recorder.db_time * 1000,
+                'queries': recorder.queries, 'rows': recorder.rows}
+
+    def measure_writes(self, client, user, samples):
+        data = {'date': datetime.date.today().isoformat(), 'description': 'Benchmark expense',
+                'amount': '12.34', 'category': 'Supermarket', 'account': 'Bank'}
+        samples['add_expense'].append(self.measure(user, client.post, reverse('add-expenses'), data))
+        expense_id = Expense.objects.filter(owner=user).latest('id').id
+        samples['edit_expense'].append(
+            self.measure(user, client.post, reverse('edit-expense', args=[expense_id]), {**data, 'amount': '23.45'}))
+        samples['delete_expense'].append(self.measure(user, client.get, reverse('delete-expense', args=[expense_id])))
+
+
+def summarize(runs):
+    latencies = sorted(run['ms'] for run in runs)
+    return {
+        'requests': len(runs),
+        'p50_ms': round(statistics.median(latencies), 2),
+        'p95_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2),
+        'db_ms': round(statistics.mean(run['db_ms'] for run in runs), 2),
+        'queries': round(statistics.mean(run['queries'] for run in runs), 1),
+        'rows': round(statistics.mean(run['rows'] for run in runs), 1),
+    }
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from balance.recurring import materialize_recurring
+from balance.utils import parse_iso_date
+
+
+class Command(BaseCommand):
+    help = 'Create the expenses and incomes of every recurring rule that are due'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--until', help='Generate occurrences up to this YYYY-MM-DD date (default: today)')
+        parser.add_argument('--batch-size', type=int, default=500, help='Rules per transaction')
+
+    def handle(self, *args, **options):
+        until = None
+        if options['until']:
+            until = parse_iso_date(options['until'])
+            if until is None:
+                raise CommandError(f"Invalid date: {options['until']}")
+
+        rules, created, left_due = materialize_recurring(until, options['batch_size'])
+        if left_due:
+            self.stdout.write(self.style.WARNING(
+                f"Rules {', '.join(map(str, left_due))} left due: no exchange rate to their owner's currency"))
+        self.stdout.write(self.style.SUCCESS(f'Created {created} transactions from {rules} recurring rules'))
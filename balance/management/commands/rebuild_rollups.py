@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from userpreferences.models import DataVersion
+from balance.budgets import refresh_all_budgets
+from balance.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the MonthlyRollup table from the Expense and Income tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        count = rebuild_rollups(batch_size=options['batch_size'])
+        # Summaries, the dashboard and budgets are all read from the rollup
+        DataVersion.bump_all()
+        budget_users = refresh_all_budgets()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {count} monthly rollup rows and refreshed the budgets of {budget_users} users'
+        ))
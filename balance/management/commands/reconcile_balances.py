@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from balance.reconcile import reconcile_balances
+
+
+class Command(BaseCommand):
+    help = 'Rebuild every Balance from the Expense and Income tables and report drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without writing')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        changes, unconverted = reconcile_balances(batch_size=options['batch_size'], dry_run=options['dry_run'])
+
+        missing = 0
+        for user_id, old, new in changes:
+            if old is None:
+                missing += 1
+                continue
+            self.stdout.write(
+                f'user {user_id}: balance {old.balance} -> {new.balance} '
+                f'(expenses {old.total_expenses} -> {new.total_expenses}, '
+                f'incomes {old.total_incomes} -> {new.total_incomes})'
+            )
+
+        if unconverted:
+            self.stdout.write(self.style.WARNING(
+                f"Left users {', '.join(map(str, unconverted))} alone: some rows have no exchange rate "
+                "to their currency"))
+
+        verb = 'Would fix' if options['dry_run'] else 'Fixed'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {len(changes) - missing} drifted and {missing} missing balances'
+        ))
@@ -0,0 +1,24 @@
+import time
+from django.core.management.base import BaseCommand
+from balance.seeding import seed, SEED_PASSWORD
+
+
+class Command(BaseCommand):
+    help = 'Bulk-create users with realistic expenses and incomes for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--transactions', type=int, default=1000, help='Expenses and incomes per user')
+        parser.add_argument('--days', type=int, default=730, help='How far back the dates go')
+        parser.add_argument('--prefix', default='seed_', help='Username prefix')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--random-seed', type=int, help='Make the generated data reproducible')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        user_ids = seed(options['users'], options['transactions'], prefix=options['prefix'], days=options['days'],
+                        batch_size=options['batch_size'], random_seed=options['random_seed'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(user_ids)} users with about {options['transactions']} transactions each "
+            f"in {time.perf_counter() - started:.1f}s (password '{SEED_PASSWORD}')"
+        ))
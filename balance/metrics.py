@@ -0,0 +1,192 @@
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+from django.conf import settings
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+FLUSH_INTERVAL_SECONDS = 5
+
+_local = threading.local()
+_shards = []
+_shards_lock = threading.Lock()
+_metrics = {}
+_next_flush = 0.0
+_process_file = None
+
+
+def _shard():
+    """
+    This thread's {(metric name, labels): value} dict. Recording only touches
+    it, so the hot path takes no lock; readers merge every thread's shard.
+    """
+    try:
+        return _local.values
+    except AttributeError:
+        _local.values = {}
+        with _shards_lock:
+            _shards.append(_local.values)
+        return _local.values
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        _metrics[name] = self
+
+    def inc(self, *labels, amount=1):
+        values = _shard()
+        key = (self.name, labels)
+        values[key] = values.get(key, 0) + amount
+
+    def merge(self, current, value):
+        return (current or 0) + value
+
+    def samples(self, labels, value):
+        yield self.name, labels, value
+
+
+class Histogram:
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        _metrics[name] = self
+
+    def observe(self, value, *labels):
+        values = _shard()
+        key = (self.name, labels)
+        # [count per bucket..., count above the last bucket, sum]
+        entry = values.get(key)
+        if entry is None:
+            entry = values[key] = [0] * (len(self.buckets) + 2)
+        entry[bisect.bisect_left(self.buckets, value)] += 1
+        entry[-1] += value
+
+    def merge(self, current, value):
+        if current is None:
+            return list(value)
+        return [a + b for a, b in zip(current, value)]
+
+    def samples(self, labels, value):
+        cumulative = 0
+        for bound, count in zip(self.buckets, value):
+            cumulative += count
+            yield f'{self.name}_bucket', labels + (('le', format_value(bound)),), cumulative
+        cumulative += value[-2]
+        yield f'{self.name}_bucket', labels + (('le', '+Inf'),), cumulative
+        yield f'{self.name}_sum', labels, value[-1]
+        yield f'{self.name}_count', labels, cumulative
+
+
+REQUESTS = Counter('http_requests_total', 'Requests by URL name, method and status', ('view', 'method', 'status'))
+REQUEST_SECONDS = Histogram('http_request_duration_seconds', 'Request latency by URL name', ('view',))
+DB_QUERIES = Counter('db_queries_total', 'SQL statements run by URL name', ('view',))
+CACHE_LOOKUPS = Counter('cache_lookups_total', 'Cache lookups by cache and result (hit or miss)', ('cache', 'result'))
+BALANCE_UPDATES = Counter('balance_updates_total', 'Balance updates by mode (delta or recompute)', ('mode',))
+
+
+def record_cache(name, hit):
+    CACHE_LOOKUPS.inc(name, 'hit' if hit else 'miss')
+
+
+def process_snapshot():
+    """This process' values merged across its threads: {(name, labels): value}."""
+    with _shards_lock:
+        shards = list(_shards)
+    snapshot = {}
+    for shard in shards:
+        for (name, labels), value in list(shard.items()):
+            snapshot[name, labels] = _metrics[name].merge(snapshot.get((name, labels)), value)
+    return snapshot
+
+
+def metrics_dir():
+    return getattr(settings, 'METRICS_DIR', '')
+
+
+def flush(force=False):
+    """
+    Write this process' snapshot to its own file in METRICS_DIR, at most every
+    FLUSH_INTERVAL_SECONDS unless forced, so the /metrics endpoint of any
+    worker can add up all of them. Files are replaced atomically.
+    """
+    global _next_flush, _process_file
+    directory = metrics_dir()
+    now = time.monotonic()
+    if not directory or (not force and now < _next_flush):
+        return
+    _next_flush = now + FLUSH_INTERVAL_SECONDS
+    if _process_file is None:
+        # pid plus start time, so a recycled pid never overwrites a dead worker's counts
+        _process_file = os.path.join(directory, f'{os.getpid()}-{int(time.time() * 1000)}.json')
+    rows = [[name, list(labels), value] for (name, labels), value in process_snapshot().items()]
+    temporary = f'{_process_file}.tmp'
+    with open(temporary, 'w') as file:
+        json.dump(rows, file)
+    os.replace(temporary, _process_file)
+
+
+def collect():
+    """Values of every worker when METRICS_DIR is set, of this process otherwise."""
+    if not metrics_dir():
+        return process_snapshot()
+    flush(force=True)
+    merged = {}
+    for path in glob.glob(os.path.join(metrics_dir(), '*.json')):
+        try:
+            with open(path) as file:
+                rows = json.load(file)
+        except (OSError, ValueError):
+            continue
+        for name, labels, value in rows:
+            if name in _metrics:
+                key = (name, tuple(labels))
+                merged[key] = _metrics[name].merge(merged.get(key), value)
+    return merged
+
+
+def format_value(value):
+    return repr(float(value)) if not isinstance(value, str) else value
+
+
+def escape(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def render(values, gauges=()):
+    """
+    Prometheus text exposition of collected values plus gauges computed at
+    scrape time, given as (name, documentation, labelnames, [(labels, value)]).
+    """
+    lines = []
+    for metric in _metrics.values():
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.type}')
+        for (name, labels), value in sorted(values.items()):
+            if name != metric.name:
+                continue
+            for sample, sample_labels, number in metric.samples(tuple(zip(metric.labelnames, labels)), value):
+                lines.append(sample_line(sample, sample_labels, number))
+
+    for name, documentation, labelnames, rows in gauges:
+        lines.append(f'# HELP {name} {documentation}')
+        lines.append(f'# TYPE {name} gauge')
+        for labels, number in rows:
+            lines.append(sample_line(name, tuple(zip(labelnames, labels)), number))
+    return '\n'.join(lines) + '\n'
+
+
+def sample_line(name, labels, value):
+    if labels:
+        name += '{' + ','.join(f'{key}="{escape(label)}"' for key, label in labels) + '}'
+    return f'{name} {format_value(value)}'
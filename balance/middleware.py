@@ -0,0 +1,149 @@
+import contextvars
+import heapq
+import json
+import logging
+import random
+import time
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.template.backends.django import Template
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+SLOWEST_STATEMENTS = 3
+STATEMENT_LOG_LENGTH = 300
+
+_current_timing = contextvars.ContextVar('request_timing', default=None)
+
+
+class RequestTiming:
+    """SQL and template timings of one sampled request, in seconds."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.slowest = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.queries += 1
+            self.db_time += elapsed
+            # Min-heap of the slowest statements seen so far
+            entry = (elapsed, self.queries, sql)
+            if len(self.slowest) < SLOWEST_STATEMENTS:
+                heapq.heappush(self.slowest, entry)
+            elif elapsed > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, entry)
+
+
+def _timed_render(render):
+    def timed_render(self, context=None, request=None):
+        timing = _current_timing.get()
+        if timing is None:
+            return render(self, context, request)
+        started = time.perf_counter()
+        try:
+            return render(self, context, request)
+        finally:
+            timing.template_time += time.perf_counter() - started
+    timed_render.timed = True
+    return timed_render
+
+
+class RequestTimingMiddleware:
+    """
+    Record the query count, DB time, slowest statements, template render time
+    and total time of a sample of requests (REQUEST_TIMING_SAMPLE_RATE, from 0
+    to 1), and report them as a Server-Timing header and a JSON log line.
+    With a rate of 0 Django drops the middleware at startup.
+    """
+
+    def __init__(self, get_response):
+        self.sample_rate = getattr(settings, 'REQUEST_TIMING_SAMPLE_RATE', 0)
+        if self.sample_rate <= 0:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        # Every render() shortcut goes through the backend template once, includes stay inside it
+        if not getattr(Template.render, 'timed', False):
+            Template.render = _timed_render(Template.render)
+
+    def __call__(self, request):
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        timing = RequestTiming()
+        token = _current_timing.set(timing)
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(timing):
+                response = self.get_response(request)
+        finally:
+            _current_timing.reset(token)
+        total = time.perf_counter() - started
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={timing.db_time * 1000:.1f};desc="{timing.queries} queries"',
+            f'tpl;dur={timing.template_time * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ])
+        match = request.resolver_match
+        logger.info(json.dumps({
+            'event': 'request_timing',
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'user': request.user.pk if hasattr(request, 'user') and request.user.is_authenticated else None,
+            'total_ms': round(total * 1000, 1),
+            'db_ms': round(timing.db_time * 1000, 1),
+            'queries': timing.queries,
+            'template_ms': round(timing.template_time * 1000, 1),
+            'slowest': [{'ms': round(elapsed * 1000, 1), 'sql': sql[:STATEMENT_LOG_LENGTH]}
+                        for elapsed, _, sql in sorted(timing.slowest, reverse=True)],
+        }))
+        return response
+
+
+class QueryCounter:
+    def __init__(self):
+        self.queries = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+
+class MetricsMiddleware:
+    """
+    Count requests, their latency and their SQL statements per URL name into
+    the in-process registry served by /metrics. Off when METRICS_ENABLED is
+    False.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        started = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        # URL names keep the label set small, unmatched paths share one
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        metrics.REQUESTS.inc(view, request.method, str(response.status_code))
+        metrics.REQUEST_SECONDS.observe(elapsed, view)
+        metrics.DB_QUERIES.inc(view, amount=counter.queries)
+        metrics.flush()
+        return response
@@ -0,0 +1,57 @@
+# Generated by Django 5.0.7 on 2026-10-18 13:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum, Count
+from django.db.models.functions import TruncMonth
+
+
+def build_rollups(apps, schema_editor):
+    MonthlyRollup = apps.get_model('balance', 'MonthlyRollup')
+    for kind, model in (('expense', apps.get_model('expenses', 'Expense')),
+                        ('income', apps.get_model('incomes', 'Income'))):
+        rows = (model.objects.order_by()
+                .values('owner', 'category', 'account', 'currency', month=TruncMonth('date'))
+                .annotate(total=Sum('amount'), count=Count('id')))
+        MonthlyRollup.objects.bulk_create(
+            (MonthlyRollup(user_id=row['owner'], kind=kind, category=row['category'], account=row['account'],
+                           currency=row['currency'] or '', month=row['month'], total=row['total'], count=row['count'])
+             for row in rows.iterator()),
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('balance', '0002_rename_userbalance_balance'),
+        ('expenses', '0006_transaction_currency'),
+        ('incomes', '0006_transaction_currency'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('expense', 'Expense'), ('income', 'Income')], max_length=10)),
+                ('category', models.CharField(max_length=255)),
+                ('account', models.CharField(max_length=255)),
+                ('currency', models.CharField(blank=True, default='', max_length=10)),
+                ('month', models.DateField()),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'kind', 'month'], name='rollup_user_kind_month_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='monthlyrollup',
+            constraint=models.UniqueConstraint(fields=('user', 'kind', 'category', 'account', 'currency', 'month'), name='unique_monthly_rollup'),
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
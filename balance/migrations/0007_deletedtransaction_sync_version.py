@@ -0,0 +1,37 @@
+# Generated by Django 5.0.7 on 2026-10-18 13:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('balance', '0006_deletedtransaction'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='deletedtransaction',
+            name='deleted_txn_sync_idx',
+        ),
+        migrations.AddField(
+            model_name='deletedtransaction',
+            name='sync_version',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        # Rows written so far are committed, version 0 puts them before any cursor
+        migrations.RunSQL(
+            'UPDATE balance_deletedtransaction SET sync_version = 0 WHERE sync_version IS NULL',
+            migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='deletedtransaction',
+            index=models.Index(fields=['user', 'kind', 'sync_version'], name='deleted_txn_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deletedtransaction',
+            index=models.Index(condition=models.Q(('sync_version__isnull', True)), fields=['user'], name='deleted_txn_unsynced_idx'),
+        ),
+    ]
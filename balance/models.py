@@ -1,7 +1,18 @@
-from django.db import models
+import calendar
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+from django.db import models, transaction, IntegrityError
+from django.db.models import F, OuterRef, Subquery
 from django.contrib.auth.models import User
 from expenses.models import Expense
-from incomes.models import Income 
+from incomes.models import Income
+from userpreferences.models import UserPreferences, DataVersion
+from .utils import converted_totals
+from . import metrics
+
+# Above this many keys MonthlyRollup.record switches to bulk statements
+RECORD_BULK_THRESHOLD = 20
 
 class Balance(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -9,11 +20,306 @@ class Balance(models.Model):
     total_incomes = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
 
-    def update_balance(self, request):
-        self.total_expenses = Expense.objects.filter(owner=request.user).aggregate(total=models.Sum('amount'))['total'] or 0 
-        self.total_incomes = Income.objects.filter(owner=request.user).aggregate(total=models.Sum('amount'))['total'] or 0 
+    def update_balance(self):
+        """Full recompute from the transaction tables. Prefer apply_delta on writes."""
+        currency = display_currency(self.user_id)
+        self.total_expenses = converted_totals(Expense.objects.filter(owner=self.user_id), (), currency).get((), [0])[0]
+        self.total_incomes = converted_totals(Income.objects.filter(owner=self.user_id), (), currency).get((), [0])[0]
         self.balance = self.total_incomes - self.total_expenses
         self.save()
+        metrics.BALANCE_UPDATES.inc('recompute')
+
+    @classmethod
+    def apply_delta(cls, user, expenses=0, incomes=0):
+        """
+        Shift a user's totals with a single atomic UPDATE. Amounts are in the
+        user's display currency. Call it inside the same transaction as the
+        write it accounts for. A user without a Balance row yet gets one
+        built from a full recompute instead.
+        """
+        user_id = getattr(user, 'pk', user)
+        DataVersion.bump(user_id)
+        stamp_sync_versions([user_id])
+        updated = cls.objects.filter(user_id=user_id).update(
+            total_expenses=F('total_expenses') + expenses,
+            total_incomes=F('total_incomes') + incomes,
+            balance=F('balance') + incomes - expenses,
+        )
+        if updated:
+            metrics.BALANCE_UPDATES.inc('delta')
+        else:
+            balance, created = cls.objects.get_or_create(user_id=user_id)
+            if created:
+                balance.update_balance()
+            else:
+                cls.apply_delta(user_id, expenses=expenses, incomes=incomes)
+
+    @classmethod
+    def apply_deltas(cls, deltas):
+        """
+        apply_delta for many users at once, given {user id: {'expenses': ...,
+        'incomes': ...}}: their rows are locked and written back with one
+        bulk_update. Users without a row get one from a full recompute.
+        """
+        DataVersion.bump_many(deltas)
+        stamp_sync_versions(list(deltas))
+        balances = list(cls.objects.select_for_update().filter(user_id__in=deltas))
+        for balance in balances:
+            delta = deltas[balance.user_id]
+            balance.total_expenses += delta.get('expenses', 0)
+            balance.total_incomes += delta.get('incomes', 0)
+            balance.balance = balance.total_incomes - balance.total_expenses
+        cls.objects.bulk_update(balances, ['total_expenses', 'total_incomes', 'balance'], batch_size=1000)
+        metrics.BALANCE_UPDATES.inc('delta', amount=len(balances))
+
+        for user_id in set(deltas) - {balance.user_id for balance in balances}:
+            balance, created = cls.objects.get_or_create(user_id=user_id)
+            if created:
+                balance.update_balance()
+            else:
+                cls.apply_delta(user_id, **deltas[user_id])
 
     def __str__(self):
         return f"{self.user.username} - Balance: {self.balance}"
+
+
+class MonthlyRollup(models.Model):
+    """
+    Running sum and count of a user's transactions per kind, category,
+    account, currency and month. Kept current on every write so summaries
+    read a handful of rows per month instead of the raw transactions.
+    """
+    KIND_CHOICES = [('expense', 'Expense'), ('income', 'Income')]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    category = models.CharField(max_length=255)
+    account = models.CharField(max_length=255)
+    currency = models.CharField(max_length=10, blank=True, default='')
+    month = models.DateField()
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'kind', 'category', 'account', 'currency', 'month'],
+                                    name='unique_monthly_rollup'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'kind', 'month'], name='rollup_user_kind_month_idx'),
+        ]
+
+    @classmethod
+    def record(cls, transactions, sign=1):
+        """
+        Fold Expense/Income instances into their months; sign=-1 takes them
+        out again. Call it inside the transaction that writes them.
+        """
+        deltas = defaultdict(lambda: [Decimal('0'), 0])
+        for item in transactions:
+            date = item.date if isinstance(item.date, datetime.date) else datetime.date.fromisoformat(item.date)
+            key = (item.owner_id, type(item).__name__.lower(), item.category, item.account,
+                   item.currency or '', date.replace(day=1))
+            deltas[key][0] += sign * Decimal(item.amount)
+            deltas[key][1] += sign
+
+        if len(deltas) > RECORD_BULK_THRESHOLD:
+            cls.apply_deltas(deltas)
+            return
+        for (user_id, kind, category, account, currency, month), (total, count) in deltas.items():
+            cls.apply_delta(user_id=user_id, kind=kind, category=category, account=account,
+                            currency=currency, month=month, total=total, count=count)
+
+    @classmethod
+    def apply_deltas(cls, deltas):
+        """
+        apply_delta for many keys at once: lock the rows that exist, then one
+        bulk_update and one bulk_create instead of a statement per key.
+        """
+        existing = cls.objects.select_for_update().filter(
+            user__in={key[0] for key in deltas}, month__in={key[5] for key in deltas},
+        )
+        to_update = []
+        for rollup in existing:
+            delta = deltas.pop((rollup.user_id, rollup.kind, rollup.category, rollup.account,
+                                rollup.currency, rollup.month), None)
+            if delta:
+                rollup.total += delta[0]
+                rollup.count += delta[1]
+                to_update.append(rollup)
+        cls.objects.bulk_update(to_update, ['total', 'count'], batch_size=1000)
+        cls.objects.bulk_create(
+            [cls(user_id=user_id, kind=kind, category=category, account=account, currency=currency,
+                 month=month, total=total, count=count)
+             for (user_id, kind, category, account, currency, month), (total, count) in deltas.items()],
+            batch_size=1000,
+        )
+
+    @classmethod
+    def apply_delta(cls, total, count, **key):
+        updated = cls.objects.filter(**key).update(total=F('total') + total, count=F('count') + count)
+        if updated:
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(total=total, count=count, **key)
+        except IntegrityError:
+            # Created concurrently since the UPDATE above
+            cls.objects.filter(**key).update(total=F('total') + total, count=F('count') + count)
+
+    def __str__(self):
+        return f"{self.user_id} {self.kind} {self.category} {self.month:%Y-%m}: {self.total}"
+
+
+class Budget(models.Model):
+    """
+    Spending limit of a user's expense category per month or year. `spent`
+    is kept current for the period running from period_start to period_end
+    by apply_expense on every write; balance.budgets rolls it over to the
+    next period when that one begins.
+    """
+    PERIOD_CHOICES = [('month', 'Monthly'), ('year', 'Yearly')]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    category = models.CharField(max_length=255)
+    period = models.CharField(max_length=10, choices=PERIOD_CHOICES, default='month')
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    period_start = models.DateField()
+    period_end = models.DateField()
+    spent = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'category', 'period'], name='unique_budget'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'category', 'period_start'], name='budget_user_cat_start_idx'),
+        ]
+
+    @classmethod
+    def apply_expense(cls, user, category, date, amount):
+        """
+        Add an expense amount, in the user's display currency, to the spent
+        counter of every budget of its category whose current period holds
+        `date`. A single UPDATE; call it inside the write's transaction.
+        """
+        if not isinstance(date, datetime.date):
+            date = datetime.date.fromisoformat(date)
+        cls.objects.filter(user=user, category=category, period_start__lte=date, period_end__gte=date) \
+            .update(spent=F('spent') + amount)
+
+    @property
+    def remaining(self):
+        return self.amount - self.spent
+
+    @property
+    def used_percent(self):
+        return (self.spent / self.amount * 100).quantize(Decimal('1')) if self.amount else Decimal('0')
+
+    @property
+    def is_over(self):
+        return self.spent > self.amount
+
+    def __str__(self):
+        return f"{self.user_id} {self.category} {self.period}: {self.spent}/{self.amount}"
+
+
+class RecurringRule(models.Model):
+    """
+    A transaction repeated every week, month or year from `anchor_date`.
+    `next_date` is the first occurrence not generated yet; the
+    materialize_recurring command creates every due one.
+    """
+    KIND_CHOICES = [('expense', 'Expense'), ('income', 'Income')]
+    INTERVAL_CHOICES = [('week', 'Weekly'), ('month', 'Monthly'), ('year', 'Yearly')]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    description = models.CharField(max_length=50)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    category = models.CharField(max_length=255)
+    account = models.CharField(max_length=255)
+    currency = models.CharField(max_length=10, blank=True, default='')
+    interval = models.CharField(max_length=10, choices=INTERVAL_CHOICES, default='month')
+    anchor_date = models.DateField()
+    end_date = models.DateField(null=True, blank=True)
+    next_date = models.DateField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['next_date'], name='recurring_next_date_idx'),
+        ]
+
+    def occurrence_after(self, date):
+        """The occurrence following `date`, counted from the anchor so month ends do not drift."""
+        if self.interval == 'week':
+            return date + datetime.timedelta(weeks=1)
+        step = 12 if self.interval == 'year' else 1
+        months = (date.year - self.anchor_date.year) * 12 + date.month - self.anchor_date.month + step
+        year, month = divmod(self.anchor_date.month - 1 + months, 12)
+        year, month = self.anchor_date.year + year, month + 1
+        return datetime.date(year, month, min(self.anchor_date.day, calendar.monthrange(year, month)[1]))
+
+    def due_occurrences(self, until):
+        """Dates from next_date up to and including `until`, within end_date."""
+        last = min(until, self.end_date) if self.end_date else until
+        date = self.next_date
+        while date <= last:
+            yield date
+            date = self.occurrence_after(date)
+
+    def __str__(self):
+        return f"{self.user_id} {self.get_interval_display()} {self.kind} {self.description}: {self.amount}"
+
+
+
+class DeletedTransaction(models.Model):
+    """
+    Tombstone of a deleted expense or income, so sync clients asking for the
+    changes since a cursor learn about deletions too.
+    """
+    KIND_CHOICES = [('expense', 'Expense'), ('income', 'Income')]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    transaction_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+    # Stamped like the transaction rows, see stamp_sync_versions
+    sync_version = models.PositiveBigIntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'kind', 'sync_version'], name='deleted_txn_sync_idx'),
+            models.Index(fields=['user'], condition=models.Q(sync_version__isnull=True),
+                         name='deleted_txn_unsynced_idx'),
+        ]
+
+    @classmethod
+    def record(cls, transactions):
+        """Store tombstones for deleted Expense/Income instances, within the deleting transaction."""
+        cls.objects.bulk_create([
+            cls(user_id=item.owner_id, kind=type(item).__name__.lower(), transaction_id=item.pk)
+            for item in transactions
+        ])
+
+    def __str__(self):
+        return f"{self.user_id} {self.kind} {self.transaction_id} deleted {self.deleted_at}"
+
+def stamp_sync_versions(user_ids):
+    """
+    Stamp the users' pending expenses, incomes and tombstones with their
+    current data version. Call it right after bumping that version, inside
+    the transaction that wrote the rows: the bump keeps the version row
+    locked until commit, so versions are handed out in commit order and
+    once a reader sees version V, no row with a version up to V can still
+    show up later. Delta sync relies on it instead of write timestamps.
+    """
+    for model, owner in ((Expense, 'owner'), (Income, 'owner'), (DeletedTransaction, 'user')):
+        version = DataVersion.objects.filter(user=OuterRef(owner)).values('version')[:1]
+        model.objects.filter(**{f'{owner}__in': user_ids}, sync_version__isnull=True).update(
+            sync_version=Subquery(version))
+
+def display_currency(user_id):
+    """The currency balances and summaries are shown in for a user."""
+    currency_code = UserPreferences.objects.filter(user=user_id).values_list('currency_code', flat=True).first()
+    return currency_code or UserPreferences._meta.get_field('currency_code').default
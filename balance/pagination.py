@@ -0,0 +1,84 @@
+import datetime
+import hashlib
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils.encoding import force_str
+from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
+from . import metrics
+
+COUNT_CACHE_TIMEOUT = 60
+
+
+class KeysetPage:
+    """
+    One page of rows ordered newest first by (date, id). Exposes the cursors
+    the templates need for their previous / next links.
+    """
+
+    def __init__(self, object_list, has_previous, has_next, encode=None):
+        encode = encode or encode_cursor
+        self.object_list = object_list
+        self.has_previous = has_previous
+        self.has_next = has_next
+        self.previous_cursor = encode('p', object_list[0]) if has_previous and object_list else ''
+        self.next_cursor = encode('n', object_list[-1]) if has_next and object_list else ''
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def encode_cursor(direction, row):
+    return urlsafe_base64_encode(f'{direction}|{row.date.isoformat()}|{row.id}'.encode())
+
+
+def decode_cursor(cursor):
+    """Return (direction, date, id) or None when the cursor is missing or malformed."""
+    try:
+        direction, date, id = force_str(urlsafe_base64_decode(cursor)).split('|')
+        if direction not in ('p', 'n'):
+            return None
+        return direction, datetime.date.fromisoformat(date), int(id)
+    except (ValueError, TypeError):
+        return None
+
+
+def keyset_page(queryset, cursor, per_page):
+    """
+    Seek to the page after (or before) the cursor's (date, id) key instead of
+    OFFSET scanning, so every page costs the same as the first one.
+    """
+    key = decode_cursor(cursor) if cursor else None
+
+    if key is None:
+        rows = list(queryset.order_by('-date', '-id')[:per_page + 1])
+        return KeysetPage(rows[:per_page], has_previous=False, has_next=len(rows) > per_page)
+
+    direction, date, id = key
+    if direction == 'n':
+        rows = list(queryset.filter(Q(date__lt=date) | Q(date=date, id__lt=id))
+                    .order_by('-date', '-id')[:per_page + 1])
+        return KeysetPage(rows[:per_page], has_previous=True, has_next=len(rows) > per_page)
+
+    rows = list(queryset.filter(Q(date__gt=date) | Q(date=date, id__gt=id))
+                .order_by('date', 'id')[:per_page + 1])
+    has_previous = len(rows) > per_page
+    return KeysetPage(rows[:per_page][::-1], has_previous=has_previous, has_next=True)
+
+
+def cached_count(queryset, *key_parts):
+    """
+    COUNT(*) of a queryset, cached for COUNT_CACHE_TIMEOUT seconds under
+    `key_parts`. Include the user's data version in them so a write
+    invalidates the total at once.
+    """
+    digest = hashlib.md5(':'.join(str(part) for part in key_parts).encode()).hexdigest()
+    cache_key = f'keyset-count:{queryset.model._meta.label_lower}:{digest}'
+    count = cache.get(cache_key)
+    metrics.record_cache('keyset-count', count is not None)
+    if count is None:
+        count = queryset.count()
+        cache.set(cache_key, count, COUNT_CACHE_TIMEOUT)
+    return count
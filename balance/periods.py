@@ -0,0 +1,102 @@
+import datetime
+from django.core.cache import cache
+from configuration.settings import DEFAULT_DAYS_IN_TIME_INTERVALS
+from .rollups import period_totals
+from .utils import summarize_totals, parse_iso_date
+from . import metrics
+
+SUMMARY_CACHE_TIMEOUT = 60 * 60
+CALENDAR_PERIODS = {
+    'this_month': 'This month',
+    'last_month': 'Last month',
+    'this_quarter': 'This quarter',
+    'last_quarter': 'Last quarter',
+    'ytd': 'Year to date',
+    'last_year': 'Last year',
+}
+COMPARISONS = ('previous', 'year')
+
+
+def quarter_start(date):
+    return date.replace(month=(date.month - 1) // 3 * 3 + 1, day=1)
+
+
+def shift_years(date, years):
+    try:
+        return date.replace(year=date.year + years)
+    except ValueError:
+        # 29 February
+        return date.replace(year=date.year + years, day=28)
+
+
+def resolve_period(interval, params, today=None):
+    """
+    (start, end) of a summary period, both inclusive, or None when it cannot
+    be resolved. `interval` is a rolling DEFAULT_DAYS_IN_TIME_INTERVALS key
+    ending today, a CALENDAR_PERIODS key, or 'custom' with `start` and `end`
+    in params.
+    """
+    today = today or datetime.date.today()
+
+    if interval == 'custom':
+        start, end = parse_iso_date(params.get('start')), parse_iso_date(params.get('end'))
+        if start is None or end is None or start > end:
+            return None
+        return start, end
+
+    if interval in DEFAULT_DAYS_IN_TIME_INTERVALS:
+        return today - datetime.timedelta(days=DEFAULT_DAYS_IN_TIME_INTERVALS[interval]), today
+
+    if interval == 'this_month':
+        return today.replace(day=1), today
+    if interval == 'last_month':
+        end = today.replace(day=1) - datetime.timedelta(days=1)
+        return end.replace(day=1), end
+    if interval == 'this_quarter':
+        return quarter_start(today), today
+    if interval == 'last_quarter':
+        end = quarter_start(today) - datetime.timedelta(days=1)
+        return quarter_start(end), end
+    if interval == 'ytd':
+        return today.replace(month=1, day=1), today
+    if interval == 'last_year':
+        return datetime.date(today.year - 1, 1, 1), datetime.date(today.year - 1, 12, 31)
+    return None
+
+
+def comparison_period(start, end, compare):
+    """
+    The period to compare (start, end) against: the equally long period
+    right before it ('previous') or the same dates a year earlier ('year').
+    """
+    if compare == 'previous':
+        previous_end = start - datetime.timedelta(days=1)
+        return previous_end - (end - start), previous_end
+    if compare == 'year':
+        return shift_years(start, -1), shift_years(end, -1)
+    return None
+
+
+def default_granularity(start, end):
+    days = (end - start).days
+    if days <= 31:
+        return 'day'
+    if days <= 120:
+        return 'week'
+    return 'month'
+
+
+def category_summary(user, kind, start, end, currency, data_version):
+    """
+    summarize_totals() of a user's period, cached by user, range, currency
+    and data version. Any write bumps the version, so entries never need to
+    be invalidated and simply age out.
+    """
+    key = f'summary:{kind}:{user.id}:{start.isoformat()}:{end.isoformat()}:{currency}:{data_version}'
+    summary = cache.get(key)
+    metrics.record_cache('summary', summary is not None)
+    if summary is None:
+        # Whole months come from the monthly rollup, only the edge months from the raw rows
+        summary = summarize_totals(period_totals(user, kind, start, end, currency))
+        cache.set(key, summary, SUMMARY_CACHE_TIMEOUT)
+    return summary
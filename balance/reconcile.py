@@ -0,0 +1,77 @@
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.db import transaction
+from expenses.models import Expense
+from incomes.models import Income
+from userpreferences.models import UserPreferences, DataVersion
+from .models import Balance
+from .utils import TWO_PLACES, converted_totals
+
+
+def totals_by_owner(model, user_ids):
+    """
+    The given owners' totals, each converted to that owner's display
+    currency, and the owners some of whose rows have no exchange rate.
+    """
+    default = UserPreferences._meta.get_field('currency_code').default
+    currencies = dict(UserPreferences.objects.filter(user_id__in=user_ids).values_list('user_id', 'currency_code'))
+    owners_by_currency = {}
+    for user_id in user_ids:
+        owners_by_currency.setdefault(currencies.get(user_id) or default, []).append(user_id)
+
+    totals, incomplete = {}, set()
+    for currency, owners in owners_by_currency.items():
+        converted = converted_totals(model.objects.filter(owner__in=owners), ('owner',), currency)
+        for (owner,), (total, count) in converted.items():
+            # Cents, as stored; SQLite sums decimals as floats
+            totals[owner] = Decimal(total).quantize(TWO_PLACES)
+        incomplete.update(owner for (owner,) in converted.incomplete)
+    return totals, incomplete
+
+
+def reconcile_balances(users=None, batch_size=1000, dry_run=False):
+    """
+    Recompute the Balance of every user, or of `users`, from the transaction
+    tables and write the ones that drifted. Each batch locks its Balance
+    rows before summing, so a concurrent apply_delta either lands before
+    the sums or waits and applies on top of them. Corrected users get a new
+    data version. Users with rows no exchange rate converts are left alone.
+    Returns ([(user id, old Balance or None, new Balance) per corrected
+    user], ids of the users left alone).
+    """
+    user_ids = list(User.objects.order_by('id').values_list('id', flat=True) if users is None else users)
+    changes, unconverted = [], []
+    for offset in range(0, len(user_ids), batch_size):
+        batch = user_ids[offset:offset + batch_size]
+        with transaction.atomic():
+            balances = {balance.user_id: balance
+                        for balance in Balance.objects.select_for_update().filter(user_id__in=batch)}
+            expenses, incomplete_expenses = totals_by_owner(Expense, batch)
+            incomes, incomplete_incomes = totals_by_owner(Income, batch)
+
+            to_create, to_update = [], []
+            for user_id in batch:
+                if user_id in incomplete_expenses or user_id in incomplete_incomes:
+                    unconverted.append(user_id)
+                    continue
+                total_expenses = expenses.get(user_id) or 0
+                total_incomes = incomes.get(user_id) or 0
+                expected = Balance(user_id=user_id, total_expenses=total_expenses, total_incomes=total_incomes,
+                                   balance=total_incomes - total_expenses)
+                balance = balances.get(user_id)
+                if balance is None:
+                    to_create.append(expected)
+                elif (balance.total_expenses, balance.total_incomes, balance.balance) != \
+                        (expected.total_expenses, expected.total_incomes, expected.balance):
+                    expected.pk = balance.pk
+                    to_update.append(expected)
+                else:
+                    continue
+                changes.append((user_id, balance, expected))
+
+            if not dry_run and (to_create or to_update):
+                # A concurrent first write may create a missing row meanwhile, from a full recompute
+                Balance.objects.bulk_create(to_create, ignore_conflicts=True)
+                Balance.objects.bulk_update(to_update, ['total_expenses', 'total_incomes', 'balance'])
+                DataVersion.bump_many([balance.user_id for balance in to_create + to_update])
+    return changes, unconverted
@@ -0,0 +1,98 @@
+import datetime
+import logging
+from collections import defaultdict
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import F, Q
+from userpreferences.currencies import MissingRate, rates
+from userpreferences.models import UserPreferences
+from .models import Balance, MonthlyRollup, Budget, RecurringRule
+from .budgets import refresh_budgets
+from .rollups import KIND_MODELS
+
+logger = logging.getLogger(__name__)
+
+
+def materialize_batch(until, batch_size, skip=()):
+    """
+    Generate the due occurrences of up to `batch_size` rules in one
+    transaction: one bulk_create per kind, one balance update per user.
+    Rules are locked and skipped by concurrent runs; occurrences that
+    already exist are left alone, so running again is harmless. A rule
+    whose amounts cannot be converted to its owner's currency is left due
+    and reported, as are the ids in `skip`.
+    Returns (rules processed, transactions created, ids of the rules left due).
+    """
+    missing_rates = []
+    with transaction.atomic():
+        rules = list(RecurringRule.objects
+                     .select_for_update(skip_locked=True)
+                     .filter(Q(end_date__isnull=True) | Q(next_date__lte=F('end_date')), next_date__lte=until)
+                     .exclude(id__in=skip)
+                     .order_by('next_date', 'id')[:batch_size])
+        if not rules:
+            return 0, 0, missing_rates
+
+        existing = set()
+        for model in KIND_MODELS.values():
+            existing.update(model.objects.filter(recurring_rule__in=rules)
+                            .filter(date__gte=min(rule.next_date for rule in rules))
+                            .values_list('recurring_rule_id', 'date'))
+
+        user_ids = {rule.user_id for rule in rules}
+        default = UserPreferences._meta.get_field('currency_code').default
+        currencies = dict(UserPreferences.objects.filter(user__in=user_ids).values_list('user', 'currency_code'))
+
+        created = {'expense': [], 'income': []}
+        deltas = defaultdict(lambda: {'expenses': Decimal('0'), 'incomes': Decimal('0')})
+        for rule in rules:
+            currency = currencies.get(rule.user_id) or default
+            dates = list(rule.due_occurrences(until))
+            new_dates = [date for date in dates if (rule.id, date) not in existing]
+            try:
+                amounts = [rates.convert(rule.amount, rule.currency or currency, currency, date) for date in new_dates]
+            except MissingRate as error:
+                logger.warning('Recurring rule %s left due: %s', rule.id, error)
+                missing_rates.append(rule.id)
+                continue
+            for date, amount in zip(new_dates, amounts):
+                created[rule.kind].append(KIND_MODELS[rule.kind](
+                    owner_id=rule.user_id, date=date, description=rule.description, amount=rule.amount,
+                    category=rule.category, account=rule.account, currency=rule.currency or currency,
+                    recurring_rule=rule,
+                ))
+                deltas[rule.user_id]['expenses' if rule.kind == 'expense' else 'incomes'] += amount
+
+            if dates:
+                rule.next_date = rule.occurrence_after(dates[-1])
+        RecurringRule.objects.bulk_update(rules, ['next_date'])
+
+        for kind, instances in created.items():
+            KIND_MODELS[kind].objects.bulk_create(instances)
+            MonthlyRollup.record(instances)
+
+        Balance.apply_deltas(deltas)
+        budgets = defaultdict(list)
+        for budget in Budget.objects.filter(user__in=deltas):
+            budgets[budget.user_id].append(budget)
+        for user_id, user_budgets in budgets.items():
+            refresh_budgets(user_id, currencies.get(user_id) or default, user_budgets)
+
+    return len(rules), sum(len(instances) for instances in created.values()), missing_rates
+
+
+def materialize_recurring(until=None, batch_size=500):
+    """
+    Generate every due occurrence of every rule, batch after batch.
+    Returns (rules processed, transactions created, ids of the rules left due).
+    """
+    until = until or datetime.date.today()
+    total_rules = total_created = 0
+    left_due = []
+    while True:
+        rules, created, missing_rates = materialize_batch(until, batch_size, skip=left_due)
+        total_rules += rules
+        total_created += created
+        left_due += missing_rates
+        if rules < batch_size:
+            return total_rules, total_created, left_due
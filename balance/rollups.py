@@ -0,0 +1,100 @@
+import datetime
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Q, Sum, Count
+from django.db.models.functions import TruncMonth
+from expenses.models import Expense
+from incomes.models import Income
+from .models import MonthlyRollup
+from .utils import ConvertedTotals, converted_totals
+
+KIND_MODELS = {'expense': Expense, 'income': Income}
+
+
+def month_start(date):
+    return date.replace(day=1)
+
+
+def next_month(date):
+    return (date.replace(day=1) + datetime.timedelta(days=32)).replace(day=1)
+
+
+def rebuild_rollups(batch_size=1000, users=None):
+    """Recompute the rollup rows of every user, or only of `users`, from the transaction tables."""
+    with transaction.atomic():
+        rollups = MonthlyRollup.objects.all()
+        if users is not None:
+            rollups = rollups.filter(user__in=users)
+        rollups.delete()
+        for kind, model in KIND_MODELS.items():
+            transactions = model.objects.all() if users is None else model.objects.filter(owner__in=users)
+            rows = (transactions.order_by()
+                    .values('owner', 'category', 'account', 'currency', month=TruncMonth('date'))
+                    .annotate(total=Sum('amount'), count=Count('id')))
+            MonthlyRollup.objects.bulk_create(
+                (MonthlyRollup(user_id=row['owner'], kind=kind, category=row['category'], account=row['account'],
+                               currency=row['currency'] or '', month=row['month'], total=row['total'],
+                               count=row['count'])
+                 for row in rows.iterator()),
+                batch_size=batch_size,
+            )
+    return rollups.count()
+
+
+def add_rollup_totals(totals, rollups, group_by, currency):
+    """
+    Fold rollup rows into ConvertedTotals. Foreign currency months are
+    converted at the mid-month rate.
+    """
+    rows = rollups.values(*group_by, 'currency', 'month').annotate(total=Sum('total'), count=Sum('count'))
+    for row in rows:
+        if not row['count']:
+            continue
+        key = tuple(row[field] for field in group_by)
+        entry = totals.setdefault(key, [Decimal('0'), 0])
+        entry[1] += row['count']
+        totals.add_converted(key, row['total'], row['currency'] or None, currency, row['month'].replace(day=15))
+    return totals
+
+
+def period_totals(user, kind, start, end, currency, group_by=('category',)):
+    """
+    Sum and count a user's expenses or incomes between two dates inclusive.
+    Whole months inside the range come from MonthlyRollup; only the partial
+    months at either edge are aggregated from the raw rows.
+    Returns {group values tuple: [total, count]} in `currency`.
+    """
+    first_full = start if start.day == 1 else next_month(start)
+    after_last_full = month_start(end) if next_month(end) != end + datetime.timedelta(days=1) else next_month(end)
+
+    if first_full >= after_last_full:
+        return converted_totals(KIND_MODELS[kind].objects.filter(owner=user, date__gte=start, date__lte=end),
+                                group_by, currency)
+
+    edges = KIND_MODELS[kind].objects.filter(
+        Q(date__gte=start, date__lt=first_full) | Q(date__gte=after_last_full, date__lte=end),
+        owner=user,
+    )
+    totals = converted_totals(edges, group_by, currency)
+    rollups = MonthlyRollup.objects.filter(user=user, kind=kind, month__gte=first_full, month__lt=after_last_full)
+    return add_rollup_totals(totals, rollups, group_by, currency)
+
+
+def monthly_overview(user, currency, months=12):
+    """Expense and income totals of the last `months` months, oldest first, from the rollup only."""
+    current = month_start(datetime.date.today())
+    first = current
+    for _ in range(months - 1):
+        first = month_start(first - datetime.timedelta(days=1))
+
+    totals = add_rollup_totals(ConvertedTotals(), MonthlyRollup.objects.filter(user=user, month__gte=first),
+                               ('month', 'kind'), currency)
+    overview = []
+    month = first
+    while month <= current:
+        expenses = totals.get((month, 'expense'), [Decimal('0'), 0])[0]
+        incomes = totals.get((month, 'income'), [Decimal('0'), 0])[0]
+        overview.append({'month': month, 'expenses': expenses, 'incomes': incomes, 'net': incomes - expenses,
+                         'incomplete': bool({(month, 'expense'), (month, 'income')} & totals.incomplete)})
+        month = next_month(month)
+    return overview
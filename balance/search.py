@@ -0,0 +1,180 @@
+import datetime
+import re
+import shlex
+from decimal import Decimal, InvalidOperation
+from django.db import connections
+from django.db.models import BooleanField, Q
+from django.db.models.expressions import RawSQL
+
+AMOUNT = r'\d+(?:[.,]\d{1,2})?'
+DATE = r'\d{4}-\d{2}(?:-\d{2})?'
+AMOUNT_RANGE = re.compile(rf'^({AMOUNT})\.\.({AMOUNT})$')
+AMOUNT_COMPARISON = re.compile(rf'^(<=|>=|<|>)({AMOUNT})$')
+DATE_RANGE = re.compile(rf'^({DATE})\.\.({DATE})$')
+
+
+class ParsedSearch:
+    """
+    The search box text split into typed predicates. Everything that is not
+    an amount, a date or a category/account name ends up in `terms`, which
+    is matched against the description full-text index and, as a substring,
+    against the category and account names.
+    """
+
+    def __init__(self):
+        self.amount_min = None
+        self.amount_max = None
+        self.date_from = None
+        self.date_to = None
+        self.categories = []
+        self.accounts = []
+        self.terms = []
+
+
+def parse_amount(value):
+    try:
+        return Decimal(value.replace(',', '.'))
+    except InvalidOperation:
+        return None
+
+
+def parse_date_bounds(value):
+    """Return the first and last day covered by YYYY-MM-DD or YYYY-MM, or None."""
+    try:
+        if len(value) == 7:
+            first = datetime.date.fromisoformat(f'{value}-01')
+            next_month = (first + datetime.timedelta(days=32)).replace(day=1)
+            return first, next_month - datetime.timedelta(days=1)
+        day = datetime.date.fromisoformat(value)
+        return day, day
+    except ValueError:
+        return None
+
+
+def resolve_name(value, names):
+    """Match a name case-insensitively against the user's list, keeping its spelling."""
+    lowered = value.lower()
+    for name in names:
+        if name.lower() == lowered:
+            return name
+    return None
+
+
+def parse_search(text, categories=(), accounts=()):
+    """
+    Understands:
+        42 / 42.50                              exact amount
+        >100 / <=20                             amount bounds
+        10..50                                  amount range
+        2024-05-01 / 2024-05                    a day or a whole month
+        2024-01..2024-03-15                     date range
+        category:Food / account:"Credit Card"   equality, quotes for spaces
+    A bare word or the whole text naming one of the user's categories or
+    accounts is treated as an equality filter too.
+    """
+    parsed = ParsedSearch()
+    text = text.strip()
+
+    whole_category = resolve_name(text, categories)
+    whole_account = resolve_name(text, accounts)
+    if whole_category or whole_account:
+        if whole_category:
+            parsed.categories.append(whole_category)
+        if whole_account:
+            parsed.accounts.append(whole_account)
+        return parsed
+
+    try:
+        tokens = shlex.split(text)
+    except ValueError:
+        tokens = text.split()
+
+    for token in tokens:
+        prefix, _, value = token.partition(':')
+        if value and prefix.lower() == 'category':
+            parsed.categories.append(resolve_name(value, categories) or value)
+        elif value and prefix.lower() == 'account':
+            parsed.accounts.append(resolve_name(value, accounts) or value)
+        elif re.fullmatch(AMOUNT, token):
+            parsed.amount_min = parsed.amount_max = parse_amount(token)
+        elif match := AMOUNT_COMPARISON.match(token):
+            operator, amount = match.group(1), parse_amount(match.group(2))
+            if operator.startswith('>'):
+                parsed.amount_min = amount
+            else:
+                parsed.amount_max = amount
+        elif match := AMOUNT_RANGE.match(token):
+            parsed.amount_min = parse_amount(match.group(1))
+            parsed.amount_max = parse_amount(match.group(2))
+        elif re.fullmatch(DATE, token) and parse_date_bounds(token):
+            parsed.date_from, parsed.date_to = parse_date_bounds(token)
+        elif (match := DATE_RANGE.match(token)) and parse_date_bounds(match.group(1)) and parse_date_bounds(match.group(2)):
+            parsed.date_from = parse_date_bounds(match.group(1))[0]
+            parsed.date_to = parse_date_bounds(match.group(2))[1]
+        elif category := resolve_name(token, categories):
+            parsed.categories.append(category)
+        elif account := resolve_name(token, accounts):
+            parsed.accounts.append(account)
+        else:
+            parsed.terms.append(token)
+    return parsed
+
+
+def description_match(queryset, word):
+    """A condition for rows whose description has a word starting with `word`."""
+    vendor = connections[queryset.db].vendor
+    table = queryset.model._meta.db_table
+
+    if vendor == 'postgresql':
+        return Q(RawSQL(
+            f'''to_tsvector('simple', "{table}"."description") @@ to_tsquery('simple', %s)''',
+            [f'{word}:*'], output_field=BooleanField(),
+        ))
+
+    if vendor == 'sqlite':
+        return Q(id__in=RawSQL(f'SELECT rowid FROM {table}_fts WHERE {table}_fts MATCH %s', [f'"{word}"*']))
+
+    return Q(description__icontains=word)
+
+
+def names_containing(word, names):
+    lowered = word.lower()
+    return [name for name in names if lowered in name.lower()]
+
+
+def full_text_filter(queryset, terms, categories=(), accounts=()):
+    """
+    Restrict a queryset to rows where every term appears in the description,
+    using the index the search migrations created for the current database,
+    or inside the category or account name, so "food" still finds "Food Out".
+    Names are matched against the user's own lists here, so the database
+    only sees equality lookups its (owner, category) and (owner, account)
+    indexes serve next to the full-text one.
+    """
+    words = [word for term in terms for word in re.findall(r'\w+', term)]
+    for word in words:
+        condition = description_match(queryset, word)
+        if matching := names_containing(word, categories):
+            condition |= Q(category__in=matching)
+        if matching := names_containing(word, accounts):
+            condition |= Q(account__in=matching)
+        queryset = queryset.filter(condition)
+    return queryset
+
+
+def apply_search(queryset, text, categories=(), accounts=()):
+    parsed = parse_search(text, categories, accounts)
+
+    if parsed.amount_min is not None:
+        queryset = queryset.filter(amount__gte=parsed.amount_min)
+    if parsed.amount_max is not None:
+        queryset = queryset.filter(amount__lte=parsed.amount_max)
+    if parsed.date_from is not None:
+        queryset = queryset.filter(date__gte=parsed.date_from, date__lte=parsed.date_to)
+    if parsed.categories:
+        queryset = queryset.filter(category__in=parsed.categories)
+    if parsed.accounts:
+        queryset = queryset.filter(account__in=parsed.accounts)
+    if parsed.terms:
+        queryset = full_text_filter(queryset, parsed.terms, categories, accounts)
+    return queryset
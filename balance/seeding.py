@@ -0,0 +1,121 @@
+import datetime
+import math
+import random
+from decimal import Decimal
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from expenses.models import Expense
+from incomes.models import Income
+from userpreferences.models import UserPreferences, DataVersion
+from .models import Balance, stamp_sync_versions
+from .rollups import rebuild_rollups
+
+# Category: (relative frequency, median amount, spread, descriptions)
+EXPENSE_PROFILE = {
+    'Supermarket': (30, 35, 0.6, ['Groceries', 'Weekly shop', 'Bakery', 'Market']),
+    'Food Out': (15, 22, 0.5, ['Lunch', 'Dinner out', 'Coffee', 'Takeaway']),
+    'Bills & Services': (8, 60, 0.5, ['Electricity', 'Water', 'Internet', 'Phone']),
+    'Transfers': (5, 100, 0.8, ['Transfer', 'Savings']),
+    'Fun': (8, 30, 0.7, ['Cinema', 'Concert', 'Games', 'Books']),
+    'Health & Body & Mind': (5, 40, 0.6, ['Pharmacy', 'Gym', 'Doctor']),
+    'Home': (5, 45, 0.8, ['Furniture', 'Cleaning', 'Repairs']),
+    'Clothes': (4, 50, 0.6, ['Shoes', 'Jacket', 'Shirt']),
+    'Travel': (3, 180, 0.9, ['Train tickets', 'Flight', 'Hotel']),
+    'Gifts': (3, 40, 0.6, ['Birthday present', 'Flowers']),
+    'Dog': (4, 25, 0.5, ['Dog food', 'Vet']),
+}
+WEEKEND_CATEGORIES = ('Food Out', 'Fun')
+ACCOUNT_WEIGHTS = {'Bank': 8, 'Cash': 2}
+SEED_PASSWORD = 'benchmark'
+
+
+def sample_amount(rng, median, spread):
+    return Decimal(math.exp(rng.gauss(math.log(median), spread))).quantize(Decimal('0.01'))
+
+
+def user_transactions(rng, user_id, count, today, days):
+    """
+    About `count` expenses and incomes of one user over the last `days`
+    days: rent on the 1st and salary on the 25th of every month, the rest
+    spread over weighted categories with log-normal amounts and evenings
+    out moved towards weekends.
+    """
+    start = today - datetime.timedelta(days=days)
+    months = []
+    month = start.replace(day=1)
+    while month <= today:
+        months.append(month)
+        month = (month + datetime.timedelta(days=32)).replace(day=1)
+
+    rent = sample_amount(rng, 800, 0.3)
+    salary = sample_amount(rng, 2500, 0.3)
+    expenses = [Expense(owner_id=user_id, date=month, description='Rent', amount=rent, category='Rent',
+                        account='Bank', currency='EUR')
+                for month in months if start <= month <= today]
+    incomes = [Income(owner_id=user_id, date=month.replace(day=25), description='Salary', amount=salary,
+                      category='Salary', account='Bank', currency='EUR')
+               for month in months if start <= month.replace(day=25) <= today]
+
+    categories = list(EXPENSE_PROFILE)
+    weights = [EXPENSE_PROFILE[category][0] for category in categories]
+    accounts, account_weights = list(ACCOUNT_WEIGHTS), list(ACCOUNT_WEIGHTS.values())
+    remaining = max(count - len(expenses) - len(incomes), 0)
+    for category in rng.choices(categories, weights, k=remaining):
+        frequency, median, spread, descriptions = EXPENSE_PROFILE[category]
+        date = start + datetime.timedelta(days=rng.randint(0, days))
+        if category in WEEKEND_CATEGORIES and date.weekday() < 4 and rng.random() < 0.5:
+            date = min(date + datetime.timedelta(days=5 - date.weekday()), today)
+        if rng.random() < 0.05:
+            incomes.append(Income(owner_id=user_id, date=date, description='Sold item',
+                                  amount=sample_amount(rng, 60, 0.8), category='Sales',
+                                  account=rng.choices(accounts, account_weights)[0], currency='EUR'))
+            continue
+        expenses.append(Expense(owner_id=user_id, date=date, description=rng.choice(descriptions),
+                                amount=sample_amount(rng, median, spread), category=category,
+                                account=rng.choices(accounts, account_weights)[0], currency='EUR'))
+    return expenses, incomes
+
+
+def seed(users, transactions, prefix='seed_', days=730, batch_size=5000, random_seed=None):
+    """
+    Bulk-create `users` users with default preferences and about
+    `transactions` expenses and incomes each, plus their balances and
+    monthly rollups. Returns the new users' ids.
+    """
+    rng = random.Random(random_seed)
+    today = datetime.date.today()
+    password = make_password(SEED_PASSWORD)
+    first = User.objects.filter(username__startswith=prefix).count()
+    names = [f'{prefix}{first + i}' for i in range(users)]
+
+    with transaction.atomic():
+        User.objects.bulk_create([User(username=name, email=f'{name}@example.com', password=password)
+                                  for name in names], batch_size=batch_size)
+        user_ids = list(User.objects.filter(username__in=names).values_list('id', flat=True))
+        UserPreferences.objects.bulk_create([UserPreferences(user_id=user_id) for user_id in user_ids],
+                                            batch_size=batch_size)
+
+        pending = {Expense: [], Income: []}
+        balances = []
+        for user_id in user_ids:
+            expenses, incomes = user_transactions(rng, user_id, transactions, today, days)
+            total_expenses = sum((expense.amount for expense in expenses), Decimal('0'))
+            total_incomes = sum((income.amount for income in incomes), Decimal('0'))
+            balances.append(Balance(user_id=user_id, total_expenses=total_expenses, total_incomes=total_incomes,
+                                    balance=total_incomes - total_expenses))
+            pending[Expense].extend(expenses)
+            pending[Income].extend(incomes)
+            for model, rows in pending.items():
+                if len(rows) >= batch_size:
+                    model.objects.bulk_create(rows, batch_size=batch_size)
+                    rows.clear()
+
+        for model, rows in pending.items():
+            model.objects.bulk_create(rows, batch_size=batch_size)
+        Balance.objects.bulk_create(balances, batch_size=batch_size)
+        DataVersion.bump_many(user_ids)
+        stamp_sync_versions(user_ids)
+        rebuild_rollups(batch_size=batch_size, users=user_ids)
+
+    return user_ids
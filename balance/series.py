@@ -0,0 +1,50 @@
+import datetime
+import numpy as np
+import pandas as pd
+from django.db.models.functions import TruncDay, TruncWeek, TruncMonth
+from .utils import converted_totals
+
+# Database truncation and matching pandas frequency of every granularity
+GRANULARITIES = {
+    'day': (TruncDay, 'D'),
+    'week': (TruncWeek, 'W-MON'),
+    'month': (TruncMonth, 'MS'),
+}
+
+
+def bucket_start(date, granularity):
+    """The first day of the bucket `date` falls in, as the database truncates it."""
+    if granularity == 'week':
+        return date - datetime.timedelta(days=date.weekday())
+    if granularity == 'month':
+        return date.replace(day=1)
+    return date
+
+
+def time_series(queryset, granularity, start, end, currency, by_category=False):
+    """
+    Sums of an Expense or Income queryset between two dates per day, week
+    (starting Monday) or month, in `currency`, optionally one series per
+    category. The buckets are grouped in the database in one query; empty
+    ones are filled with zeros by reindexing on a pandas date range.
+    Returns (bucket labels, {series name: [sums]}).
+    """
+    trunc, frequency = GRANULARITIES[granularity]
+    queryset = queryset.filter(date__gte=start, date__lte=end).annotate(bucket=trunc('date'))
+    group_by = ('bucket', 'category') if by_category else ('bucket',)
+    totals = converted_totals(queryset, group_by, currency)
+
+    buckets = pd.date_range(bucket_start(start, granularity), end, freq=frequency)
+    frame = pd.DataFrame(
+        [(pd.Timestamp(key[0]), key[1] if by_category else 'Total', float(total))
+         for key, (total, count) in totals.items()],
+        columns=['bucket', 'series', 'total'],
+    )
+    table = (frame.pivot_table(index='bucket', columns='series', values='total', aggfunc='sum')
+             .reindex(buckets, fill_value=0.0)
+             .fillna(0.0))
+    if not by_category and 'Total' not in table:
+        table['Total'] = np.zeros(len(buckets))
+
+    labels = [bucket.date().isoformat() for bucket in buckets]
+    return labels, {name: table[name].round(2).tolist() for name in table.columns}
@@ -0,0 +1,180 @@
+import datetime
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.encoding import force_str
+from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
+from userpreferences.currencies import MissingRate, rates
+from userpreferences.models import DataVersion
+from .models import Balance, Budget, MonthlyRollup, DeletedTransaction
+from .budgets import refresh_budgets
+from .importers import build_transaction
+from .rollups import KIND_MODELS
+
+MAX_BATCH_OPERATIONS = 1000
+SYNC_PAGE_SIZE = 500
+API_FIELDS = ('date', 'description', 'amount', 'category', 'account')
+
+
+class BatchError(Exception):
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def serialize(item):
+    return {
+        'id': item.id,
+        'date': item.date.isoformat() if isinstance(item.date, datetime.date) else item.date,
+        'description': item.description,
+        'amount': str(item.amount),
+        'category': item.category,
+        'account': item.account,
+        'currency': item.currency,
+        'updated_at': item.updated_at.isoformat() if item.updated_at else None,
+    }
+
+
+def encode_sync_cursor(version, id=None):
+    return urlsafe_base64_encode(f"{version}|{'' if id is None else id}".encode())
+
+
+def decode_sync_cursor(cursor):
+    """
+    Return (version, id) or None when malformed. Everything up to the
+    (sync_version, id) key has been sent; an empty id means every row up to
+    `version`.
+    """
+    try:
+        version, id = force_str(urlsafe_base64_decode(cursor)).split('|')
+        return int(version), int(id) if id else None
+    except (ValueError, TypeError):
+        return None
+
+
+def changes_since(user, kind, key, per_page=SYNC_PAGE_SIZE):
+    """
+    The rows of a kind changed after the cursor key, in commit order, and the
+    ids deleted over the same span. Only versions up to the user's committed
+    data version are read, and every row at or below it is committed already
+    (see stamp_sync_versions), so a slow transaction cannot slip in behind a
+    cursor. A page ends at its last row while more are pending, otherwise at
+    that version; deletions are sent for exactly the span a page covers.
+    """
+    model = KIND_MODELS[kind]
+    horizon = DataVersion.objects.filter(user=user).values_list('version', flat=True).first() or 0
+    queryset = model.objects.filter(owner=user, sync_version__lte=horizon)
+    if key is not None:
+        version, id = key
+        after = Q(sync_version__gt=version)
+        if id is not None:
+            after |= Q(sync_version=version, id__gt=id)
+        queryset = queryset.filter(after)
+
+    rows = list(queryset.order_by('sync_version', 'id')[:per_page + 1])
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if has_more:
+        end, cursor = rows[-1].sync_version, encode_sync_cursor(rows[-1].sync_version, rows[-1].id)
+    else:
+        end, cursor = horizon, encode_sync_cursor(horizon)
+
+    deleted = []
+    if key is not None:
+        deleted = list(DeletedTransaction.objects
+                       .filter(user=user, kind=kind, sync_version__gt=key[0], sync_version__lte=end)
+                       .order_by('sync_version').values_list('transaction_id', flat=True))
+    return {'results': [serialize(row) for row in rows], 'deleted': deleted,
+            'cursor': cursor, 'has_more': has_more}
+
+
+def as_row(item):
+    # JSON numbers and strings alike, for the importer's validation
+    return {field: str(item[field]) for field in API_FIELDS if item.get(field) is not None}
+
+
+def apply_batch(user, kind, preferences, creates=(), updates=(), deletes=()):
+    """
+    Apply a client's creates, updates and deletes in one transaction: rows
+    are validated first, then written with one bulk statement per operation,
+    folded into the monthly rollup and the balance is moved once. Raises
+    BatchError with every problem found, before anything is written, or
+    when a row has no exchange rate to the user's currency.
+    """
+    model = KIND_MODELS[kind]
+    currency = preferences.currency_code
+    errors = []
+    if len(creates) + len(updates) + len(deletes) > MAX_BATCH_OPERATIONS:
+        raise BatchError([f'at most {MAX_BATCH_OPERATIONS} operations per batch'])
+
+    new_rows = []
+    for index, item in enumerate(creates):
+        instance, error = build_transaction(user, as_row(item), kind, preferences, {})
+        if error:
+            errors.append(f'create {index}: {error}')
+        else:
+            new_rows.append(instance)
+
+    update_ids = [item.get('id') for item in updates]
+    delete_ids = list(deletes)
+    if len(set(update_ids + delete_ids)) < len(update_ids + delete_ids):
+        errors.append('an id is updated or deleted more than once')
+
+    with transaction.atomic():
+        existing = model.objects.select_for_update().filter(owner=user, id__in=[*update_ids, *delete_ids])
+        existing = {row.id: row for row in existing}
+
+        changed = []
+        for index, item in enumerate(updates):
+            row = existing.get(item.get('id'))
+            if row is None:
+                errors.append(f"update {index}: no {kind} with id {item.get('id')}")
+                continue
+            values = {field: getattr(row, field) for field in API_FIELDS}
+            instance, error = build_transaction(user, {**as_row(values), **as_row(item)}, kind, preferences, {})
+            if error:
+                errors.append(f'update {index}: {error}')
+            else:
+                changed.append((row, instance))
+        removed = []
+        for index, id in enumerate(delete_ids):
+            if id not in existing:
+                errors.append(f'delete {index}: no {kind} with id {id}')
+            else:
+                removed.append(existing[id])
+        if errors:
+            raise BatchError(errors)
+
+        def converted(rows):
+            try:
+                return sum((rates.convert(row.amount, row.currency, currency, row.date) for row in rows), Decimal('0'))
+            except MissingRate as error:
+                # Raised inside the transaction, so nothing written so far is kept
+                raise BatchError([str(error)])
+
+        previous = [row for row, instance in changed] + removed
+        previous_total = converted(previous)
+        MonthlyRollup.record(previous, sign=-1)
+
+        now = timezone.now()
+        updated = []
+        for row, instance in changed:
+            for field in API_FIELDS:
+                setattr(row, field, getattr(instance, field))
+            row.updated_at = now
+            row.sync_version = None
+            updated.append(row)
+        model.objects.bulk_update(updated, [*API_FIELDS, 'updated_at', 'sync_version'])
+        model.objects.filter(owner=user, id__in=[row.id for row in removed]).delete()
+        DeletedTransaction.record(removed)
+        created = model.objects.bulk_create(new_rows)
+
+        MonthlyRollup.record(updated + created)
+        delta = converted(updated + created) - previous_total
+        Balance.apply_delta(user, **{'expenses' if kind == 'expense' else 'incomes': delta})
+        if kind == 'expense':
+            refresh_budgets(user, currency, list(Budget.objects.filter(user=user)))
+
+    return {'created': [serialize(row) for row in created], 'updated': [serialize(row) for row in updated],
+            'deleted': [row.id for row in removed]}
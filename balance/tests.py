@@ -1,3 +1,380 @@
+import datetime
+import unittest
+from decimal import Decimal
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+import expenses.views
+from expenses.models import Expense
+from incomes.models import Income
+from userpreferences.currencies import rates
+from userpreferences.models import DataVersion, ExchangeRate
+from . import importers
+from .budgets import period_bounds
+from .models import Balance, Budget, DeletedTransaction, MonthlyRollup
+from .reconcile import reconcile_balances
+from .search import apply_search
+from .sync import changes_since, decode_sync_cursor
 
-# Create your tests here.
+
+class DeltaSyncTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='sync', password='secret')
+
+    def write(self, description, commit=True):
+        expense = Expense.objects.create(owner=self.user, date=datetime.date(2026, 1, 5), description=description,
+                                         amount=Decimal('10.00'), category='Fun', account='Bank', currency='EUR')
+        if commit:
+            Balance.apply_delta(self.user, expenses=expense.amount)
+        return expense
+
+    def sync(self, cursor=None, per_page=500):
+        return changes_since(self.user, 'expense', decode_sync_cursor(cursor) if cursor else None, per_page)
+
+    def test_row_committed_late_with_an_old_stamp_is_not_skipped(self):
+        self.write('first')
+        first = self.sync()
+        self.assertEqual([row['description'] for row in first['results']], ['first'])
+
+        # A long transaction wrote this row an hour ago and has not committed yet
+        late = self.write('late', commit=False)
+        Expense.objects.filter(pk=late.pk).update(updated_at=timezone.now() - datetime.timedelta(hours=1))
+        during = self.sync(first['cursor'])
+        self.assertEqual(during['results'], [])
+
+        # Its commit stamps it after the cursor handed out meanwhile
+        Balance.apply_delta(self.user, expenses=late.amount)
+        after = self.sync(during['cursor'])
+        self.assertEqual([row['id'] for row in after['results']], [late.pk])
+
+    def test_deletions_follow_the_cursor(self):
+        self.write('kept')
+        removed = self.write('removed')
+        cursor = self.sync()['cursor']
+
+        DeletedTransaction.record([removed])
+        removed_id = removed.pk
+        removed.delete()
+        Balance.apply_delta(self.user, expenses=-removed.amount)
+
+        changes = self.sync(cursor)
+        self.assertEqual(changes['results'], [])
+        self.assertEqual(changes['deleted'], [removed_id])
+        self.assertEqual(self.sync(changes['cursor'])['deleted'], [])
+
+    def test_pages_cover_every_row_once(self):
+        ids = [self.write(f'row {i}').pk for i in range(7)]
+        seen, cursor = [], None
+        while True:
+            page = self.sync(cursor, per_page=3)
+            seen += [row['id'] for row in page['results']]
+            cursor = page['cursor']
+            if not page['has_more']:
+                break
+        self.assertEqual(seen, ids)
+
+
+class MoneyTestCase(TestCase):
+    """Posts transactions through the views and reads back the figures kept alongside them."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='money', password='secret')
+        self.client.force_login(self.user)
+        self.today = datetime.date.today()
+        start, end = period_bounds('month', self.today)
+        self.budget = Budget.objects.create(user=self.user, category='Food Out', period='month',
+                                            amount=Decimal('100.00'), period_start=start, period_end=end)
+        rates.clear()
+
+    def post(self, name, data, *args):
+        fields = {'date': self.today.isoformat(), 'description': 'Lunch', 'category': 'Food Out', 'account': 'Bank'}
+        return self.client.post(reverse(name, args=args), {**fields, **data})
+
+    def balance(self):
+        balance = Balance.objects.get(user=self.user)
+        return balance.total_expenses, balance.total_incomes, balance.balance
+
+    def rollups(self, kind='expense'):
+        totals = {}
+        for rollup in MonthlyRollup.objects.filter(user=self.user, kind=kind).exclude(count=0):
+            total, count = totals.get((rollup.category, rollup.currency), (0, 0))
+            totals[(rollup.category, rollup.currency)] = (total + rollup.total, count + rollup.count)
+        return totals
+
+    def spent(self):
+        self.budget.refresh_from_db()
+        return self.budget.spent
+
+    def version(self):
+        return DataVersion.objects.get(user=self.user).version
+
+
+class MoneyTests(MoneyTestCase):
+    def test_expense_add_edit_and_delete(self):
+        self.post('add-expenses', {'amount': '12.50'})
+        expense = Expense.objects.get(owner=self.user)
+        self.assertEqual(self.balance(), (Decimal('12.50'), 0, Decimal('-12.50')))
+        self.assertEqual(self.rollups(), {('Food Out', 'EUR'): (Decimal('12.50'), 1)})
+        self.assertEqual(self.spent(), Decimal('12.50'))
+
+        self.post('edit-expense', {'amount': '20', 'category': 'Fun'}, expense.id)
+        self.assertEqual(self.balance(), (Decimal('20.00'), 0, Decimal('-20.00')))
+        self.assertEqual(self.rollups(), {('Fun', 'EUR'): (Decimal('20.00'), 1)})
+        self.assertEqual(self.spent(), 0)
+
+        self.client.get(reverse('delete-expense', args=[expense.id]))
+        self.assertFalse(Expense.objects.filter(owner=self.user).exists())
+        self.assertEqual(self.balance(), (0, 0, 0))
+        self.assertEqual(self.rollups(), {})
+
+    def test_income_add_edit_and_delete(self):
+        self.post('add-expenses', {'amount': '30'})
+        self.post('add-incomes', {'amount': '100', 'category': 'Salary'})
+        income = Income.objects.get(owner=self.user)
+        self.assertEqual(self.balance(), (Decimal('30.00'), Decimal('100.00'), Decimal('70.00')))
+        self.assertEqual(self.rollups('income'), {('Salary', 'EUR'): (Decimal('100.00'), 1)})
+
+        self.post('edit-income', {'amount': '80,5', 'category': 'Salary'}, income.id)
+        self.assertEqual(self.balance(), (Decimal('30.00'), Decimal('80.50'), Decimal('50.50')))
+
+        self.client.get(reverse('delete-income', args=[income.id]))
+        self.assertEqual(self.balance(), (Decimal('30.00'), 0, Decimal('-30.00')))
+        self.assertEqual(self.rollups('income'), {})
+        self.assertEqual(self.spent(), Decimal('30.00'))
+
+    def test_rows_in_another_currency_move_the_balance_converted(self):
+        ExchangeRate.objects.create(date=self.today, base='USD', quote='EUR', rate=Decimal('0.5'))
+        self.post('add-expenses', {'amount': '10'})
+        Expense.objects.filter(owner=self.user).update(currency='USD', amount=Decimal('20.00'))
+        MonthlyRollup.objects.filter(user=self.user).update(currency='USD', total=Decimal('20.00'))
+        expense = Expense.objects.get(owner=self.user)
+
+        self.post('edit-expense', {'amount': '40'}, expense.id)
+        self.assertEqual(self.balance(), (Decimal('20.00'), 0, Decimal('-20.00')))
+        self.assertEqual(self.rollups(), {('Food Out', 'USD'): (Decimal('40.00'), 1)})
+
+        self.client.get(reverse('delete-expense', args=[expense.id]))
+        self.assertEqual(self.balance(), (0, 0, 0))
+
+    def test_delete_without_a_rate_changes_nothing(self):
+        self.post('add-expenses', {'amount': '10'})
+        Expense.objects.filter(owner=self.user).update(currency='USD')
+        expense = Expense.objects.get(owner=self.user)
+
+        self.client.get(reverse('delete-expense', args=[expense.id]))
+        self.assertTrue(Expense.objects.filter(pk=expense.pk).exists())
+        self.assertEqual(self.balance(), (Decimal('10.00'), 0, Decimal('-10.00')))
+
+    def test_reconcile_fixes_drift_and_bumps_the_data_version(self):
+        self.post('add-expenses', {'amount': '10'})
+        self.post('add-incomes', {'amount': '50', 'category': 'Salary'})
+        Balance.objects.filter(user=self.user).update(total_expenses=Decimal('99.00'))
+        version = self.version()
+
+        changes, unconverted = reconcile_balances(users=[self.user.id])
+        self.assertEqual([user_id for user_id, old, new in changes], [self.user.id])
+        self.assertEqual(unconverted, [])
+        self.assertEqual(self.balance(), (Decimal('10.00'), Decimal('50.00'), Decimal('40.00')))
+        self.assertEqual(self.version(), version + 1)
+
+        self.assertEqual(reconcile_balances(users=[self.user.id]), ([], []))
+        self.assertEqual(self.version(), version + 1)
+
+    def test_reconcile_leaves_users_without_a_rate_alone(self):
+        self.post('add-expenses', {'amount': '10'})
+        Expense.objects.filter(owner=self.user).update(currency='USD')
+        Balance.objects.filter(user=self.user).update(total_expenses=Decimal('99.00'))
+
+        self.assertEqual(reconcile_balances(users=[self.user.id]), ([], [self.user.id]))
+        self.assertEqual(self.balance()[0], Decimal('99.00'))
+
+
+class BulkActionTests(MoneyTestCase):
+    def setUp(self):
+        super().setUp()
+        for number in range(3):
+            self.post('add-expenses', {'description': f'Pizza {number}', 'amount': '10'})
+        self.post('add-expenses', {'description': 'Groceries', 'amount': '5', 'category': 'Supermarket'})
+        # Show the add messages, so each action below reads only its own
+        self.client.get(reverse('expenses'))
+
+    def bulk(self, data, name='bulk-expenses'):
+        response = self.client.post(reverse(name), data, follow=True)
+        return response, [str(message) for message in response.context['messages']] if response.context else []
+
+    def test_delete_every_matching_expense(self):
+        response, messages = self.bulk({'action': 'delete', 'scope': 'matching', 'search': 'pizza'})
+        self.assertEqual(response.redirect_chain, [(reverse('expenses') + '?search=pizza', 302)])
+        self.assertEqual(messages, ['3 expenses deleted successfully'])
+        self.assertEqual(list(Expense.objects.filter(owner=self.user).values_list('description', flat=True)),
+                         ['Groceries'])
+        self.assertEqual(DeletedTransaction.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(self.balance(), (Decimal('5.00'), 0, Decimal('-5.00')))
+        self.assertEqual(self.rollups(), {('Supermarket', 'EUR'): (Decimal('5.00'), 1)})
+        self.assertEqual(self.spent(), 0)
+
+    def test_recategorize_matching_is_truncated_and_picks_up_the_rest(self):
+        with mock.patch.object(expenses.views, 'BULK_ACTION_LIMIT', 2):
+            response, messages = self.bulk({'action': 'recategorize', 'category': 'Fun', 'scope': 'matching',
+                                             'search': 'pizza'})
+            self.assertEqual(messages, ['2 expenses moved to Fun',
+                                        'Only 2 expenses are changed at a time, run the action again for the rest'])
+            self.assertEqual(self.rollups(), {('Food Out', 'EUR'): (Decimal('10.00'), 1),
+                                              ('Fun', 'EUR'): (Decimal('20.00'), 2),
+                                              ('Supermarket', 'EUR'): (Decimal('5.00'), 1)})
+            self.assertEqual(self.spent(), Decimal('10.00'))
+
+            response, messages = self.bulk({'action': 'recategorize', 'category': 'Fun', 'scope': 'matching',
+                                            'search': 'pizza'})
+            self.assertEqual(messages, ['1 expense moved to Fun'])
+            response, messages = self.bulk({'action': 'recategorize', 'category': 'Fun', 'scope': 'matching',
+                                            'search': 'pizza'})
+            self.assertEqual(messages, ['No expenses selected'])
+
+        self.assertEqual(Expense.objects.filter(owner=self.user, category='Fun').count(), 3)
+        self.assertEqual(self.balance(), (Decimal('35.00'), 0, Decimal('-35.00')))
+        self.assertEqual(self.spent(), 0)
+
+    def test_selected_ids_of_other_users_are_left_alone(self):
+        other = User.objects.create_user(username='other', password='secret')
+        foreign = Expense.objects.create(owner=other, date=self.today, description='Pizza', amount=Decimal('10.00'),
+                                         category='Food Out', account='Bank', currency='EUR')
+        own = Expense.objects.filter(owner=self.user, description='Groceries').get()
+
+        response, messages = self.bulk({'action': 'delete', 'ids': [own.id, foreign.id]})
+        self.assertEqual(messages, ['1 expense deleted successfully'])
+        self.assertTrue(Expense.objects.filter(pk=foreign.pk).exists())
+        self.assertEqual(self.balance(), (Decimal('30.00'), 0, Decimal('-30.00')))
+        self.assertEqual(self.spent(), Decimal('30.00'))
+
+    def test_matching_scope_needs_a_search(self):
+        response, messages = self.bulk({'action': 'delete', 'scope': 'matching', 'search': '  '})
+        self.assertEqual(messages, ['Search first to act on every matching expense'])
+        self.assertEqual(Expense.objects.filter(owner=self.user).count(), 4)
+
+    def test_malformed_ids_are_a_bad_request(self):
+        own = Expense.objects.filter(owner=self.user).first()
+        for name in ('bulk-expenses', 'bulk-incomes'):
+            response, messages = self.bulk({'action': 'delete', 'ids': [own.id, '\u00b2']}, name)
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(Expense.objects.filter(owner=self.user).count(), 4)
+
+    def test_delete_selected_incomes(self):
+        self.post('add-incomes', {'amount': '100', 'category': 'Salary'})
+        self.post('add-incomes', {'amount': '50', 'category': 'Sales'})
+        self.client.get(reverse('expenses'))
+        salary = Income.objects.get(owner=self.user, category='Salary')
+
+        response, messages = self.bulk({'action': 'delete', 'ids': [salary.id]}, 'bulk-incomes')
+        self.assertEqual(messages, ['1 income deleted successfully'])
+        self.assertEqual(self.balance(), (Decimal('35.00'), Decimal('50.00'), Decimal('15.00')))
+        self.assertEqual(self.rollups('income'), {('Sales', 'EUR'): (Decimal('50.00'), 1)})
+
+
+class ImportTests(MoneyTestCase):
+    def upload(self, name, content, **data):
+        response = self.client.post(reverse('import-transactions'), {
+            'file': SimpleUploadedFile(name, content.encode()), 'kind': 'signed', **data})
+        return response.context['result'], [str(message) for message in response.context['messages']]
+
+    def test_csv_rows_are_parsed_and_invalid_ones_skipped(self):
+        day = self.today
+        content = '\ufeff Date ,Description,Amount,Category,Account\n' + ''.join(f'{line}\n' for line in [
+            f'{day.isoformat()},Pizza,-12.50,Food Out,Bank',
+            f'{day:%d/%m/%Y},Pay,"1000,00",Salary,Bank',
+            f'{day:%Y%m%d},Takeaway,"-7,50",,',
+            'yesterday,Late,-1,Food Out,Bank',
+            f'{day.isoformat()},Odd,abc,Food Out,Bank',
+            f'{day.isoformat()},Nothing,0,Food Out,Bank',
+            f'{day.isoformat()},Boat,-5,Yachts,Bank',
+            f'{day.isoformat()},Hidden,-5,Food Out,Vault',
+            f'{day.isoformat()},,-5,Food Out,Bank',
+        ])
+        result, messages = self.upload('bank.csv', content, default_category_expense='Food Out', default_account='Cash')
+
+        self.assertEqual((result.expenses, result.incomes), (2, 1))
+        self.assertEqual(result.errors, [
+            "Line 5: invalid date 'yesterday'",
+            "Line 6: invalid amount 'abc'",
+            'Line 7: amount is zero',
+            "Line 8: unknown expense category 'Yachts'",
+            "Line 9: unknown account 'Vault'",
+            'Line 10: description is empty',
+        ])
+        self.assertEqual(messages, ['Imported 2 expenses and 1 incomes', '6 rows were skipped'])
+        self.assertEqual(sorted(Expense.objects.filter(owner=self.user).values_list('description', 'account', 'date')),
+                         [('Pizza', 'Bank', day), ('Takeaway', 'Cash', day)])
+
+        self.assertEqual(self.balance(), (Decimal('20.00'), Decimal('1000.00'), Decimal('980.00')))
+        self.assertEqual(self.rollups(), {('Food Out', 'EUR'): (Decimal('20.00'), 2)})
+        self.assertEqual(self.rollups('income'), {('Salary', 'EUR'): (Decimal('1000.00'), 1)})
+        self.assertEqual(self.spent(), Decimal('20.00'))
+
+    def test_ofx_statement_uses_the_default_category(self):
+        content = ''.join(f'{line}\n' for line in [
+            'OFXHEADER:100', '<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>',
+            '<STMTTRN>', '<TRNTYPE>DEBIT', f'<DTPOSTED>{self.today:%Y%m%d}120000', '<TRNAMT>-4.20', '<NAME>Coffee',
+            '</STMTTRN>',
+            '<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20260101<TRNAMT>bad<NAME>Refund</STMTTRN>',
+            '</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>',
+        ])
+        result, messages = self.upload('bank.ofx', content, default_category_expense='Food Out',
+                                       default_category_income='Sales', default_account='Bank')
+
+        self.assertEqual((result.expenses, result.incomes), (1, 0))
+        self.assertEqual(result.errors, ["Line 9: invalid amount 'bad'"])
+        self.assertEqual(self.balance(), (Decimal('4.20'), 0, Decimal('-4.20')))
+        self.assertEqual(self.spent(), Decimal('4.20'))
+
+    def test_kind_of_the_form_applies_to_unsigned_amounts(self):
+        content = f'date,description,amount,category,account\n{self.today.isoformat()},Invoice,250,Sales,Bank\n'
+        result, messages = self.upload('sales.csv', content, kind='income')
+        self.assertEqual((result.expenses, result.incomes), (0, 1))
+        self.assertEqual(self.balance(), (0, Decimal('250.00'), Decimal('250.00')))
+
+    def test_reported_errors_are_capped_but_all_counted(self):
+        content = 'date,description,amount\n' + 'never,Row,1\n' * 5
+        with mock.patch.object(importers, 'MAX_REPORTED_ERRORS', 2):
+            result, messages = self.upload('broken.csv', content)
+        self.assertEqual(result.error_count, 5)
+        self.assertEqual(len(result.errors), 2)
+        self.assertEqual(messages, ['5 rows were skipped'])
+        self.assertFalse(Expense.objects.filter(owner=self.user).exists())
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='search', password='secret')
+        for description, category, account in [('Pizza night', 'Food Out', 'Bank'), ('Groceries', 'Food', 'Cash'),
+                                               ('Cinema', 'Fun', 'Credit Card'), ('Seafood', 'Fun', 'Bank')]:
+            Expense.objects.create(owner=self.user, date=datetime.date(2026, 1, 5), description=description,
+                                   amount=Decimal('10.00'), category=category, account=account, currency='EUR')
+
+    def matching(self, text):
+        return apply_search(Expense.objects.filter(owner=self.user), text, ['Food Out', 'Food', 'Fun'],
+                            ['Bank', 'Cash', 'Credit Card'])
+
+    def search(self, text):
+        return sorted(self.matching(text).values_list('description', flat=True))
+
+    def test_exact_category_name_is_an_equality_filter(self):
+        self.assertEqual(self.search('food'), ['Groceries'])
+
+    def test_words_match_category_and_account_names_as_substrings(self):
+        self.assertEqual(self.search('out'), ['Pizza night'])
+        self.assertEqual(self.search('credit'), ['Cinema'])
+        self.assertEqual(self.search('foo'), ['Groceries', 'Pizza night'])
+
+    def test_words_match_description_prefixes(self):
+        self.assertEqual(self.search('pizz'), ['Pizza night'])
+        self.assertEqual(self.search('night >5'), ['Pizza night'])
+
+    @unittest.skipUnless(connection.vendor == 'sqlite', 'reads the SQLite query plan')
+    def test_words_matching_names_still_use_the_full_text_index(self):
+        plan = self.matching('foo night').order_by('-date', '-id').explain()
+        self.assertIn('expenses_expense_fts VIRTUAL TABLE INDEX', plan)
+        self.assertNotIn('LIKE', str(self.matching('foo night').query))
@@ -0,0 +1,81 @@
+import datetime
+from django.db.models import F, Q, Value, CharField
+from django.utils.encoding import force_str
+from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
+from expenses.models import Expense
+from incomes.models import Income
+from .pagination import KeysetPage
+
+# Sign applied to the amount of each kind on the timeline
+TIMELINE_KINDS = (('expense', Expense, -1), ('income', Income, 1))
+TIMELINE_KIND_NAMES = tuple(name for name, model, sign in TIMELINE_KINDS)
+TIMELINE_FIELDS = ('id', 'date', 'description', 'category', 'account', 'currency')
+
+
+def encode_timeline_cursor(direction, row):
+    return urlsafe_base64_encode(f"{direction}|{row['date'].isoformat()}|{row['kind']}|{row['id']}".encode())
+
+
+def decode_timeline_cursor(cursor):
+    """Return (direction, date, kind, id) or None when the cursor is missing or malformed."""
+    try:
+        direction, date, kind, id = force_str(urlsafe_base64_decode(cursor)).split('|')
+        if direction not in ('p', 'n') or kind not in ('expense', 'income'):
+            return None
+        return direction, datetime.date.fromisoformat(date), kind, int(id)
+    except (ValueError, TypeError):
+        return None
+
+
+def seek(kind, key):
+    """
+    The keyset predicate of one branch. Rows are ordered by (date, kind, id)
+    and the kind is constant within a branch, so the comparison on it is
+    settled here and every branch keeps a plain (owner, date, id) range scan.
+    """
+    if key is None:
+        return Q()
+    direction, date, cursor_kind, id = key
+    after = direction == 'p'
+    beyond_date = Q(date__gt=date) if after else Q(date__lt=date)
+    if kind == cursor_kind:
+        return beyond_date | Q(date=date, id__gt=id) if after else beyond_date | Q(date=date, id__lt=id)
+    if (kind > cursor_kind) == after:
+        return beyond_date | Q(date=date)
+    return beyond_date
+
+
+def timeline_page(user, cursor, per_page, kind='', category='', account=''):
+    """
+    One page of a user's expenses and incomes, newest first, from a single
+    UNION ALL query. Expense amounts are negative. Each branch is filtered
+    and seeked on its own so both use their owner indexes.
+    """
+    key = decode_timeline_cursor(cursor) if cursor else None
+
+    branches = []
+    for name, model, sign in TIMELINE_KINDS:
+        if kind and kind != name:
+            continue
+        queryset = model.objects.filter(seek(name, key), owner=user)
+        if category:
+            queryset = queryset.filter(category=category)
+        if account:
+            queryset = queryset.filter(account=account)
+        branches.append(queryset.order_by().values(*TIMELINE_FIELDS).annotate(
+            kind=Value(name, output_field=CharField()),
+            amount=F('amount') * sign,
+        ))
+
+    if not branches:
+        return KeysetPage([], has_previous=False, has_next=False, encode=encode_timeline_cursor)
+
+    combined = branches[0].union(*branches[1:], all=True)
+    if key is not None and key[0] == 'p':
+        rows = list(combined.order_by('date', 'kind', 'id')[:per_page + 1])
+        return KeysetPage(rows[:per_page][::-1], has_previous=len(rows) > per_page, has_next=True,
+                          encode=encode_timeline_cursor)
+
+    rows = list(combined.order_by('-date', '-kind', '-id')[:per_page + 1])
+    return KeysetPage(rows[:per_page], has_previous=key is not None, has_next=len(rows) > per_page,
+                      encode=encode_timeline_cursor)
@@ -3,4 +3,12 @@ from . import views
 
 urlpatterns = [
     path('', views.balance_view, name='dashboard'),
+    path('import', views.import_view, name='import-transactions'),
+    path('export', views.export_view, name='export-transactions'),
+    path('timeline', views.timeline_view, name='timeline'),
+    path('timeline/json', views.timeline_json, name='timeline-json'),
+    path('budgets', views.budgets_view, name='budgets'),
+    path('recurring', views.recurring_view, name='recurring'),
+    path('metrics', views.metrics_view, name='metrics'),
+    path('api/<str:kind>', views.transactions_api, name='transactions-api'),
 ]
@@ -0,0 +1,116 @@
+import datetime
+from decimal import Decimal
+from django.db.models import Sum, Count
+from userpreferences.currencies import MissingRate, rates
+
+CALCULATION_TYPES = ('total', 'mean', 'proportions')
+TWO_PLACES = Decimal('0.01')
+
+
+class ConvertedTotals(dict):
+    """
+    {group values tuple: [total, count]} in one currency. Keys in
+    `incomplete` leave out amounts no exchange rate could convert.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.incomplete = set()
+
+    def add_converted(self, key, amount, base, currency, date):
+        try:
+            self[key][0] += rates.convert(amount, base, currency, date)
+        except MissingRate:
+            self.incomplete.add(key)
+
+
+def converted_totals(queryset, group_by, currency):
+    """
+    Sum and count the rows of an Expense or Income queryset per `group_by`
+    fields, with amounts converted to `currency`. One GROUP BY query covers
+    rows already in that currency (and legacy rows without one); only when
+    other currencies show up are those re-grouped by date and converted in
+    memory with the cached rates.
+    Returns ConvertedTotals, {group values tuple: [total, count]}.
+    """
+    queryset = queryset.order_by()
+    totals = ConvertedTotals()
+    foreign = set()
+    for row in queryset.values(*group_by, 'currency').annotate(total=Sum('amount'), count=Count('id')):
+        key = tuple(row[field] for field in group_by)
+        entry = totals.setdefault(key, [Decimal('0'), 0])
+        entry[1] += row['count']
+        if row['currency'] and row['currency'] != currency:
+            foreign.add(row['currency'])
+        else:
+            entry[0] += row['total']
+
+    if foreign:
+        rows = queryset.filter(currency__in=foreign).values(*group_by, 'currency', 'date').annotate(total=Sum('amount'))
+        for row in rows:
+            key = tuple(row[field] for field in group_by)
+            totals.add_converted(key, row['total'], row['currency'], currency, row['date'])
+    return totals
+
+
+def summarize_by_category(queryset, currency):
+    """
+    Compute total, count, mean and share of every category of an Expense or
+    Income queryset, in `currency`, with a single GROUP BY query.
+    """
+    return summarize_totals(converted_totals(queryset, ('category',), currency))
+
+
+def summarize_totals(totals):
+    """
+    Turn {(category,): [total, count]} into the per-category summary,
+    flagging categories whose total misses amounts without a rate.
+    """
+    incomplete = getattr(totals, 'incomplete', ())
+    grand_total = sum((total for total, count in totals.values()), Decimal('0'))
+
+    summary = {}
+    for (category,), (total, count) in totals.items():
+        if not count:
+            continue
+        share = total / grand_total * 100 if grand_total > 0 else Decimal('0')
+        summary[category] = {
+            'total': total,
+            'count': count,
+            'mean': (total / count).quantize(TWO_PLACES),
+            'proportions': share.quantize(TWO_PLACES),
+            'incomplete': (category,) in incomplete,
+        }
+    return summary
+
+
+def select_calculation(summary, calculation_type):
+    """
+    Shape a summary for the category endpoints: one {category: value} mapping
+    for a single calculation type, or one mapping per type when 'all' is asked.
+    """
+    if calculation_type == 'all':
+        return {ctype: select_calculation(summary, ctype) for ctype in CALCULATION_TYPES}
+    if calculation_type not in CALCULATION_TYPES:
+        calculation_type = 'total'
+    return {category: values[calculation_type] for category, values in summary.items()}
+
+
+def incomplete_categories(summary):
+    """Categories of a summary whose totals leave out amounts no exchange rate could convert."""
+    return sorted(category for category, values in summary.items() if values.get('incomplete'))
+
+
+def parse_iso_date(value):
+    try:
+        return datetime.date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_id(value):
+    """A primary key from form input, or None. Only ASCII digits in the bigint range count."""
+    if not isinstance(value, str) or not value.isascii() or not value.isdecimal():
+        return None
+    id = int(value)
+    return id if 0 < id < 2 ** 63 else None
@@ -1,10 +1,330 @@
-from django.shortcuts import render
+import io
+import json
+import datetime
+from decimal import Decimal, InvalidOperation
+from urllib.parse import urlencode
+from django.shortcuts import render, redirect
+from django.http import StreamingHttpResponse, JsonResponse, HttpResponse
+from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from .models import Balance
+from django.db import transaction
+from django.db.models import Count
+from django.conf import settings
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.cache import cache_control
+from authentication.models import OutboxEmail
+from userpreferences.models import DataVersion
+from userpreferences.utils import get_user_preferences, conditional_on_data_version
+from .models import Balance, Budget, RecurringRule
+from .utils import parse_id, parse_iso_date
+from .rollups import monthly_overview
+from .budgets import current_budgets, refresh_budgets
+from .importers import import_transactions, read_csv_rows, read_ofx_rows
+from .exporters import export_rows, stream_csv, stream_xlsx
+from .timeline import TIMELINE_KIND_NAMES, timeline_page
+from .sync import SYNC_PAGE_SIZE, BatchError, apply_batch, changes_since, decode_sync_cursor
+from . import metrics
 
 @login_required
+@cache_control(private=True, no_cache=True, must_revalidate=True)
+@conditional_on_data_version
 def balance_view(request):
+    # Totals are kept current by Balance.apply_delta on every write
     balance, created = Balance.objects.get_or_create(user=request.user)
-    balance = Balance.objects.get(user=request.user)
-    balance.update_balance(request)
-    return render(request, 'balance/dashboard.html', {'balance': balance})
+    if created:
+        balance.update_balance()
+    overview = monthly_overview(request.user, get_user_preferences(request).currency_code)
+    return render(request, 'balance/dashboard.html', {'balance': balance, 'overview': overview})
+
+
+@login_required(login_url='/authentication/login')
+@cache_control(no_cache=True, must_revalidate=True, no_store=True)
+def import_view(request):
+    user_preferences = get_user_preferences(request)
+    context = {
+        'categories_expenses': user_preferences.categories_expenses,
+        'categories_incomes': user_preferences.categories_incomes,
+        'accounts': user_preferences.accounts,
+        'values': request.POST,
+    }
+
+    if request.method == 'GET':
+        return render(request, 'balance/import.html', context)
+
+    uploaded_file = request.FILES.get('file')
+    if not uploaded_file:
+        messages.error(request, 'Please choose a CSV or OFX file')
+        return render(request, 'balance/import.html', context)
+
+    # Decode the upload lazily so rows are read one at a time
+    stream = io.TextIOWrapper(uploaded_file.file, encoding='utf-8-sig', errors='replace', newline='')
+    if uploaded_file.name.lower().endswith(('.ofx', '.qfx')):
+        rows = read_ofx_rows(stream)
+    else:
+        rows = read_csv_rows(stream)
+
+    defaults = {
+        'expense': request.POST.get('default_category_expense', ''),
+        'income': request.POST.get('default_category_income', ''),
+        'account': request.POST.get('default_account', ''),
+    }
+    result = import_transactions(request.user, rows, request.POST.get('kind', 'signed'), user_preferences, defaults)
+
+    if result.expenses or result.incomes:
+        messages.success(request, f'Imported {result.expenses} expenses and {result.incomes} incomes')
+    if result.error_count:
+        messages.warning(request, f'{result.error_count} rows were skipped')
+    context['result'] = result
+    return render(request, 'balance/import.html', context)
+
+
+@login_required(login_url='/authentication/login')
+@cache_control(no_cache=True, must_revalidate=True, no_store=True)
+def export_view(request):
+    user_preferences = get_user_preferences(request)
+    kind = request.GET.get('kind', 'both')
+    export_format = request.GET.get('format', 'csv')
+
+    if kind == 'expense':
+        categories = user_preferences.categories_expenses
+    elif kind == 'income':
+        categories = user_preferences.categories_incomes
+    else:
+        categories = user_preferences.categories_expenses + user_preferences.categories_incomes
+
+    rows = export_rows(
+        request.user, kind,
+        search_text=request.GET.get('search', ''),
+        start=parse_iso_date(request.GET.get('start')),
+        end=parse_iso_date(request.GET.get('end')),
+        categories=categories,
+        accounts=user_preferences.accounts,
+    )
+
+    if export_format == 'xlsx':
+        response = StreamingHttpResponse(
+            stream_xlsx(rows),
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        )
+    else:
+        export_format = 'csv'
+        response = StreamingHttpResponse(stream_csv(rows), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="transactions.{export_format}"'
+    return response
+
+
+def timeline_filters(request):
+    # Unknown kinds are ignored like any other stale filter value
+    kind = request.GET.get('kind', '')
+    return {
+        'kind': kind if kind in TIMELINE_KIND_NAMES else '',
+        'category': request.GET.get('category', ''),
+        'account': request.GET.get('account', ''),
+    }
+
+
+@login_required(login_url='/authentication/login')
+@cache_control(private=True, no_cache=True, must_revalidate=True)
+@conditional_on_data_version
+def timeline_view(request):
+    user_preferences = get_user_preferences(request)
+    filters = timeline_filters(request)
+    page_obj = timeline_page(request.user, request.GET.get('cursor', ''), user_preferences.rows_per_page, **filters)
+
+    context = {
+        'categories': sorted(set(user_preferences.categories_expenses + user_preferences.categories_incomes)),
+        'accounts': user_preferences.accounts,
+        'user_preferences': user_preferences,
+        'page_obj': page_obj,
+        'filters': filters,
+        'filter_query': urlencode(filters),
+    }
+    return render(request, 'balance/timeline.html', context)
+
+
+@login_required(login_url='/authentication/login')
+@cache_control(private=True, no_cache=True, must_revalidate=True)
+@conditional_on_data_version
+def timeline_json(request):
+    user_preferences = get_user_preferences(request)
+    page_obj = timeline_page(request.user, request.GET.get('cursor', ''), user_preferences.rows_per_page,
+                             **timeline_filters(request))
+    return JsonResponse({
+        'transactions': page_obj.object_list,
+        'previous_cursor': page_obj.previous_cursor,
+        'next_cursor': page_obj.next_cursor,
+    })
+
+
+@login_required(login_url='/authentication/login')
+@cache_control(no_cache=True, must_revalidate=True, no_store=True)
+def budgets_view(request):
+    user_preferences = get_user_preferences(request)
+    currency = user_preferences.currency_code
+
+    if request.method == 'POST':
+        if 'delete' in request.POST:
+            budget_id = parse_id(request.POST['delete'])
+            if budget_id is None:
+                messages.error(request, 'Budget not found')
+                return redirect('budgets')
+            with transaction.atomic():
+                Budget.objects.filter(pk=budget_id, user=request.user).delete()
+                DataVersion.bump(request.user.id)
+            messages.success(request, 'Budget deleted')
+            return redirect('budgets')
+
+        category = request.POST.get('category', '')
+        period = request.POST.get('period', 'month')
+        try:
+            amount = Decimal(request.POST.get('amount', '').replace(',', '.')).quantize(Decimal('0.01'))
+        except InvalidOperation:
+            amount = None
+
+        if category not in user_preferences.categories_expenses or period not in dict(Budget.PERIOD_CHOICES):
+            messages.error(request, 'Choose a category and a period')
+        elif amount is None or amount <= 0:
+            messages.error(request, 'Amount is invalid')
+        else:
+            today = datetime.date.today()
+            with transaction.atomic():
+                budget, created = Budget.objects.update_or_create(
+                    user=request.user, category=category, period=period,
+                    defaults={'amount': amount, 'period_start': today, 'period_end': today},
+                )
+                refresh_budgets(request.user, currency, [budget], today)
+                DataVersion.bump(request.user.id)
+            messages.success(request, 'Budget saved')
+            return redirect('budgets')
+
+    context = {
+        'budgets': current_budgets(request.user, currency),
+        'categories': user_preferences.categories_expenses,
+        'periods': Budget.PERIOD_CHOICES,
+        'user_preferences': user_preferences,
+        'values': request.POST,
+    }
+    return render(request, 'balance/budgets.html', context)
+
+
+@login_required(login_url='/authentication/login')
+@cache_control(no_cache=True, must_revalidate=True, no_store=True)
+def recurring_view(request):
+    user_preferences = get_user_preferences(request)
+    context = {
+        'rules': RecurringRule.objects.filter(user=request.user).order_by('kind', 'next_date'),
+        'categories_expenses': user_preferences.categories_expenses,
+        'categories_incomes': user_preferences.categories_incomes,
+        'accounts': user_preferences.accounts,
+        'intervals': RecurringRule.INTERVAL_CHOICES,
+        'user_preferences': user_preferences,
+        'values': request.POST,
+    }
+
+    if request.method == 'GET':
+        return render(request, 'balance/recurring.html', context)
+
+    if 'delete' in request.POST:
+        rule_id = parse_id(request.POST['delete'])
+        if rule_id is None:
+            messages.error(request, 'Recurring transaction not found')
+            return redirect('recurring')
+        RecurringRule.objects.filter(pk=rule_id, user=request.user).delete()
+        messages.success(request, 'Recurring transaction deleted. Transactions already created are kept')
+        return redirect('recurring')
+
+    kind = request.POST.get('kind', '')
+    category = request.POST.get(f'category_{kind}', '')
+    categories = user_preferences.categories_expenses if kind == 'expense' else user_preferences.categories_incomes
+    account = request.POST.get('account', '')
+    description = request.POST.get('description', '').strip()
+    interval = request.POST.get('interval', '')
+    anchor_date = parse_iso_date(request.POST.get('anchor_date'))
+    end_date = parse_iso_date(request.POST.get('end_date'))
+    try:
+        amount = Decimal(request.POST.get('amount', '').replace(',', '.')).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        amount = None
+
+    if (kind not in ('expense', 'income') or category not in categories or account not in user_preferences.accounts
+            or interval not in dict(RecurringRule.INTERVAL_CHOICES) or not description or anchor_date is None):
+        messages.error(request, 'All fields but the end date are mandatory')
+        return render(request, 'balance/recurring.html', context)
+    if amount is None or amount <= 0:
+        messages.error(request, 'Amount is invalid')
+        return render(request, 'balance/recurring.html', context)
+
+    RecurringRule.objects.create(
+        user=request.user, kind=kind, description=description[:50], amount=amount, category=category,
+        account=account, currency=user_preferences.currency_code, interval=interval,
+        anchor_date=anchor_date, end_date=end_date, next_date=anchor_date,
+    )
+    messages.success(request, 'Recurring transaction saved. Due occurrences are created by the next scheduled run')
+    return redirect('recurring')
+
+
+@cache_control(no_store=True)
+def metrics_view(request):
+    token = settings.METRICS_TOKEN
+    authorization = request.headers.get('Authorization', '')
+    if not (token and constant_time_compare(authorization, f'Bearer {token}')) and not request.user.is_staff:
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+
+    outbox = OutboxEmail.objects.order_by().values_list('status').annotate(count=Count('id'))
+    gauges = [('outbox_emails', 'Emails in the outbox by status', ('status',), list(outbox))]
+    return HttpResponse(metrics.render(metrics.collect(), gauges),
+                        content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+API_KINDS = {'expenses': 'expense', 'incomes': 'income'}
+
+
+def is_id_list(value):
+    return isinstance(value, list) and all(isinstance(id, int) and not isinstance(id, bool) for id in value)
+
+
+@cache_control(no_cache=True, must_revalidate=True, no_store=True)
+def transactions_api(request, kind):
+    """
+    GET: the changes since the `since` cursor (every row without one), a page
+    at a time. POST: {"create": [...], "update": [{"id": ..., ...}],
+    "delete": [ids]} applied as one batch.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+    kind = API_KINDS.get(kind)
+    if kind is None:
+        return JsonResponse({'error': 'Unknown transaction type'}, status=404)
+
+    if request.method == 'GET':
+        cursor = request.GET.get('since', '')
+        key = decode_sync_cursor(cursor) if cursor else None
+        if cursor and key is None:
+            return JsonResponse({'error': 'Invalid since cursor'}, status=400)
+        try:
+            per_page = min(max(int(request.GET.get('limit', SYNC_PAGE_SIZE)), 1), SYNC_PAGE_SIZE)
+        except ValueError:
+            return JsonResponse({'error': 'Invalid limit'}, status=400)
+        return JsonResponse(changes_since(request.user, kind, key, per_page))
+
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    if not isinstance(payload, dict):
+        return JsonResponse({'error': 'Expected a JSON object'}, status=400)
+    creates, updates, deletes = payload.get('create', []), payload.get('update', []), payload.get('delete', [])
+    valid = (isinstance(creates, list) and all(isinstance(item, dict) for item in creates)
+             and isinstance(updates, list) and all(isinstance(item, dict) for item in updates)
+             and is_id_list([item.get('id') for item in updates]) and is_id_list(deletes))
+    if not valid:
+        return JsonResponse({'error': 'create and update take lists of objects, updates need an integer id '
+                                      'and delete takes a list of integer ids'}, status=400)
+
+    try:
+        result = apply_batch(request.user, kind, get_user_preferences(request), creates, updates, deletes)
+    except BatchError as error:
+        return JsonResponse({'errors': error.errors}, status=400)
+    return JsonResponse(result)
@@ -49,6 +49,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'balance.middleware.MetricsMiddleware',
+    'balance.middleware.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -156,6 +158,43 @@ EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL')
 
+#CACHE CONFIGURATION
+# The default local-memory cache is per process. Cached data is keyed by each
+# user's data version, so workers never serve it stale, but a shared backend
+# (e.g. Redis or Memcached) lets all gunicorn workers reuse each other's entries.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+#THROTTLING
+# Login, password reset and availability checks are rate limited with token
+# buckets kept in the cache named by THROTTLE_CACHE. All workers must share
+# it (Redis, Memcached or the database cache): a local-memory cache gives
+# every process its own buckets and multiplies the limits, so the
+# "manage.py check --deploy" refuses it (authentication.E001).
+# X-Forwarded-For is only read when THROTTLE_TRUSTED_PROXIES says how many
+# proxies in front of the app append to it, e.g. 1 behind the Heroku router.
+THROTTLE_CACHE = os.getenv('THROTTLE_CACHE', 'default')
+THROTTLE_TRUSTED_PROXIES = int(os.getenv('THROTTLE_TRUSTED_PROXIES', '0'))
+
+#REQUEST TIMING
+# Share of requests (0 to 1) whose SQL and template timings are sent as a
+# Server-Timing header and logged; 0 turns the middleware off entirely.
+REQUEST_TIMING_SAMPLE_RATE = float(os.getenv('REQUEST_TIMING_SAMPLE_RATE', '0'))
+
+#METRICS
+# Request, query, cache and balance counters served in Prometheus format at
+# /metrics, to staff users or to scrapers sending "Authorization: Bearer
+# <METRICS_TOKEN>". With several gunicorn workers, set METRICS_DIR to a
+# directory emptied on every deploy; each worker writes its counts there
+# and /metrics adds them up.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True') == 'True'
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+METRICS_DIR = os.getenv('METRICS_DIR', '')
+
 DEFAULT_DAYS_IN_TIME_INTERVALS = {"Year": 365,
                                   "Quarter": 90,
                                   "Month": 30,
@@ -9,4 +9,42 @@ document.addEventListener('DOMContentLoaded', function () {
         }); 
     }
 );
-  
\ No newline at end of file
+  
+document.addEventListener('DOMContentLoaded', function () {
+    var bulkForm = document.getElementById('bulkForm');
+    if (!bulkForm) {
+        return;
+    }
+    var selectAll = document.getElementById('selectAll');
+    var scopeMatching = document.getElementById('scopeMatching');
+    var rowChecks = bulkForm.querySelectorAll('.row-select');
+    var actionButtons = bulkForm.querySelectorAll('.bulk-action');
+
+    function updateSelection() {
+        var selected = bulkForm.querySelectorAll('.row-select:checked').length;
+        var matching = scopeMatching !== null && scopeMatching.checked;
+        var count = matching ? Number(scopeMatching.dataset.count) : selected;
+        document.getElementById('selectedCount').textContent = matching ? 'All ' + count + ' matching' : selected;
+        document.getElementById('bulkDeleteSummary').textContent = matching
+            ? 'all ' + count + ' matching'
+            : 'the ' + selected + ' selected';
+        document.getElementById('bulkDeleteLimit').classList.toggle(
+            'd-none', !matching || count <= Number(scopeMatching.dataset.limit));
+        actionButtons.forEach(function (button) {
+            button.disabled = !matching && selected === 0;
+        });
+    }
+
+    selectAll.addEventListener('change', function () {
+        rowChecks.forEach(function (check) {
+            check.checked = selectAll.checked;
+        });
+        updateSelection();
+    });
+    rowChecks.forEach(function (check) {
+        check.addEventListener('change', updateSelection);
+    });
+    if (scopeMatching !== null) {
+        scopeMatching.addEventListener('change', updateSelection);
+    }
+});
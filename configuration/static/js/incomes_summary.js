@@ -126,55 +126,56 @@ const renderTable = (tableId, data) => {
 
 // Function to get data and render charts/tables
 const getChartData = (interval) => {
-  const types = ["total", "mean", "proportions"];
-
-  types.forEach((type) => {
-    fetch(
-      `/incomes/get_incomes_by_category/${interval}?calculation_type=${type}`
-    )
-      .then((res) => {
-        if (!res.ok) {
-          throw new Error(`HTTP error! status: ${res.status}`);
-        }
-        return res.json();
-      })
-      .then((results) => {
-        const incomes_by_category = results.incomes_by_category || {};
-        const [labels, data] = [
-          Object.keys(incomes_by_category),
-          Object.values(incomes_by_category),
-        ];
-
-        switch (type) {
-          case "total":
-            totalChartInstance = renderLineChart(
-              totalChartInstance,
-              "total_chart",
-              "Total Incomes by Category",
-              labels,
-              data
-            );
-            break;
-          case "mean":
-            renderTable("mean_table", incomes_by_category);
-            break;
-          case "proportions":
-            shareChartInstance = renderPolarAreaChart(
-              shareChartInstance,
-              "share_chart",
-              "Income Share by Category",
-              labels,
-              data
-            );
-            break;
-          default:
-            console.error("Invalid calculation type.");
-        }
-      })
-      .catch((error) => {
-        console.error("Error fetching data:", error);
-      });
-  });
+  // A single request returns the total, mean and proportions calculations
+  fetch(`/incomes/get_incomes_by_category/${interval}?calculation_type=all`)
+    .then((res) => {
+      if (!res.ok) {
+        throw new Error(`HTTP error! status: ${res.status}`);
+      }
+      return res.json();
+    })
+    .then((results) => {
+      const incomes_by_category = results.incomes_by_category || {};
+      const means = incomes_by_category.mean || {};
+      const proportions = incomes_by_category.proportions || {};
+
+      renderTable("mean_table", means);
+      shareChartInstance = renderPolarAreaChart(
+        shareChartInstance,
+        "share_chart",
+        "Income Share by Category",
+        Object.keys(proportions),
+        Object.values(proportions)
+      );
+    })
+    .catch((error) => {
+      console.error("Error fetching data:", error);
+    });
+};
+
+// Function to get the sums over time and render the line chart
+const getSeriesData = (interval) => {
+  fetch(`/incomes/get_incomes_series/${interval}`)
+    .then((res) => {
+      if (!res.ok) {
+        throw new Error(`HTTP error! status: ${res.status}`);
+      }
+      return res.json();
+    })
+    .then((results) => {
+      const series = results.series || {};
+
+      totalChartInstance = renderLineChart(
+        totalChartInstance,
+        "total_chart",
+        "Total Incomes over Time",
+        results.labels || [],
+        series.Total || []
+      );
+    })
+    .catch((error) => {
+      console.error("Error fetching data:", error);
+    });
 };
 
 // Set default chart load
@@ -183,6 +184,7 @@ document.addEventListener("DOMContentLoaded", () => {
 
   // Initialize charts and table with default interval
   getChartData(defaultInterval);
+  getSeriesData(defaultInterval);
 
   // Add event listener for interval change
   document
@@ -192,5 +194,6 @@ document.addEventListener("DOMContentLoaded", () => {
 
       // Fetch data for all charts and table based on selected interval
       getChartData(selectedInterval);
+      getSeriesData(selectedInterval);
     });
 });
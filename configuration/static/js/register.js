@@ -38,68 +38,68 @@ const checkFormValidity = () => {
 
 showPasswordToggle.addEventListener("click", handleToggleInput);
 
-emailField.addEventListener("keyup", (e) => {
-  const emailVal = e.target.value;
-  emailSuccessOutput.textContent = `Checking ${emailVal}...`;
+// Apply one field's result from the validation endpoint
+const showFieldResult = (field, feedBackArea, successOutput, error) => {
+  successOutput.style.display = "none";
+  if (error) {
+    field.classList.add("is-invalid");
+    feedBackArea.style.display = "block";
+    feedBackArea.innerHTML = `<p>${error}</p>`;
+    return false;
+  }
+  field.classList.remove("is-invalid");
+  feedBackArea.style.display = "none";
+  return true;
+};
 
-  emailField.classList.remove("is-invalid");
-  emailFeedBackArea.style.display = "none";
+// Both fields are checked together, once typing pauses
+let validationTimer = null;
 
-  if (emailVal.length > 0) {
-    fetch("/authentication/validate-email", {
-      body: JSON.stringify({ email: emailVal }),
-      method: "POST",
-    })
-      .then((res) => res.json())
-      .then((data) => {
-        emailSuccessOutput.style.display = "none";
-        if (data.email_error) {
-          isEmailValid = false;
-          emailField.classList.add("is-invalid");
-          emailFeedBackArea.style.display = "block";
-          emailFeedBackArea.innerHTML = `<p>${data.email_error}</p>`;
-        } else {
-          isEmailValid = true;
-          emailField.classList.remove("is-invalid");
-          emailFeedBackArea.style.display = "none";
-        }
-        checkFormValidity();
-      });
-  } else {
+const validateFields = () => {
+  const usernameVal = usernameField.value;
+  const emailVal = emailField.value;
+
+  if (usernameVal.length === 0) {
+    isUsernameValid = false;
+  }
+  if (emailVal.length === 0) {
     isEmailValid = false;
+  }
+  if (usernameVal.length === 0 && emailVal.length === 0) {
     checkFormValidity();
+    return;
   }
-});
 
-usernameField.addEventListener("keyup", (e) => {
-  const usernameVal = e.target.value;
-  usernameSuccessOutput.textContent = `Checking ${usernameVal}...`;
+  fetch("/authentication/validate-registration", {
+    body: JSON.stringify({ username: usernameVal, email: emailVal }),
+    method: "POST",
+  })
+    .then((res) => res.json())
+    .then((data) => {
+      if (usernameVal.length > 0) {
+        isUsernameValid = showFieldResult(usernameField, usernameFeedBackArea, usernameSuccessOutput, data.username_error);
+      }
+      if (emailVal.length > 0) {
+        isEmailValid = showFieldResult(emailField, emailFeedBackArea, emailSuccessOutput, data.email_error);
+      }
+      checkFormValidity();
+    });
+};
 
-  usernameField.classList.remove("is-invalid");
-  usernameFeedBackArea.style.display = "none";
+const scheduleValidation = (field, feedBackArea, successOutput) => {
+  successOutput.style.display = "block";
+  successOutput.textContent = `Checking ${field.value}...`;
+  field.classList.remove("is-invalid");
+  feedBackArea.style.display = "none";
 
-  if (usernameVal.length > 0) {
-    fetch("/authentication/validate-username", {
-      body: JSON.stringify({ username: usernameVal }),
-      method: "POST",
-    })
-      .then((res) => res.json())
-      .then((data) => {
-        usernameSuccessOutput.style.display = "none";
-        if (data.username_error) {
-          isUsernameValid = false;
-          usernameField.classList.add("is-invalid");
-          usernameFeedBackArea.style.display = "block";
-          usernameFeedBackArea.innerHTML = `<p>${data.username_error}</p>`;
-        } else {
-          isUsernameValid = true;
-          usernameField.classList.remove("is-invalid");
-          usernameFeedBackArea.style.display = "none";
-        }
-        checkFormValidity();
-      });
-  } else {
-    isUsernameValid = false;
-    checkFormValidity();
-  }
+  clearTimeout(validationTimer);
+  validationTimer = setTimeout(validateFields, 300);
+};
+
+emailField.addEventListener("keyup", () => {
+  scheduleValidation(emailField, emailFeedBackArea, emailSuccessOutput);
+});
+
+usernameField.addEventListener("keyup", () => {
+  scheduleValidation(usernameField, usernameFeedBackArea, usernameSuccessOutput);
 });
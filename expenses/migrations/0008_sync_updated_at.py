@@ -0,0 +1,42 @@
+# Generated by Django 5.0.7 on 2026-10-18 13:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0007_recurring_occurrence'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # auto_now gives the column a default, which makes SQLite rebuild the table
+        # and lose its search triggers; the database only needs a nullable column
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.AddField(
+                    model_name='expense',
+                    name='updated_at',
+                    field=models.DateTimeField(null=True),
+                ),
+            ],
+            state_operations=[
+                migrations.AddField(
+                    model_name='expense',
+                    name='updated_at',
+                    field=models.DateTimeField(auto_now=True, null=True),
+                ),
+            ],
+        ),
+        # Existing rows count as changed now, so the first sync cursor covers them
+        migrations.RunSQL(
+            'UPDATE expenses_expense SET updated_at = CURRENT_TIMESTAMP WHERE updated_at IS NULL',
+            migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['owner', 'updated_at', 'id'], name='expense_owner_updated_idx'),
+        ),
+    ]
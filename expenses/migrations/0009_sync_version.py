@@ -0,0 +1,37 @@
+# Generated by Django 5.0.7 on 2026-10-18 13:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0008_sync_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='expense',
+            name='expense_owner_updated_idx',
+        ),
+        migrations.AddField(
+            model_name='expense',
+            name='sync_version',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        # Rows written so far are committed, version 0 puts them before any cursor
+        migrations.RunSQL(
+            'UPDATE expenses_expense SET sync_version = 0 WHERE sync_version IS NULL',
+            migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['owner', 'sync_version', 'id'], name='expense_owner_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(condition=models.Q(('sync_version__isnull', True)), fields=['owner'], name='expense_unsynced_idx'),
+        ),
+    ]
@@ -7,9 +7,11 @@ urlpatterns = [
     path('add-expense', views.add_expense, name='add-expenses'),
     path('edit-expense/<int:id>', views.edit_expense, name='edit-expense'), 
     path('delete-expense/<int:id>', views.delete_expense, name='delete-expense'),
+    path('bulk-expenses', views.bulk_expenses, name='bulk-expenses'),
     path('expenses-summary', views.expenses_summary, name='expenses-summary'),
 
     #Endpoints
     path('get_expenses_by_category/<str:interval>', views.get_expenses_by_category, name='get_expenses_by_category'),
+    path('get_expenses_series/<str:interval>', views.get_expenses_series, name='get_expenses_series'),
             
 ]
@@ -1,17 +1,26 @@
 from django.shortcuts import render, redirect
+from django.urls import reverse
+from urllib.parse import urlencode
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.cache import cache_control
 from .models import Expense, Category, Account
-from userpreferences.models import UserPreferences
+from userpreferences.utils import get_user_preferences, get_data_version, conditional_on_data_version
+from userpreferences.currencies import MissingRate, rates
 from django.contrib import messages
 from decimal import Decimal
-from django.core.paginator import Paginator
 from django.views.decorators.csrf import csrf_exempt
 import json
-from django.http import JsonResponse
-from django.db.models import Q
-from balance.models import Balance
-from django.db.models import Sum
+from django.http import JsonResponse, HttpResponseBadRequest
+from django.db import transaction
+from balance.models import Balance, MonthlyRollup, Budget, DeletedTransaction
+from balance.budgets import warn_over_budget
+from balance.utils import incomplete_categories, parse_id, select_calculation
+from balance.periods import (CALENDAR_PERIODS, COMPARISONS, resolve_period, comparison_period,
+                             default_granularity, category_summary)
+from balance.series import time_series, GRANULARITIES
+from balance.pagination import keyset_page, cached_count
+from balance.search import apply_search
+from balance.bulk import BULK_ACTION_LIMIT, bulk_delete, bulk_recategorize
 import datetime
 from configuration.settings import DEFAULT_DAYS_IN_TIME_INTERVALS
 
@@ -20,38 +29,31 @@ from configuration.settings import DEFAULT_DAYS_IN_TIME_INTERVALS
 #########################################################
 
 @login_required(login_url='/authentication/login')
-@cache_control(no_cache=True, must_revalidate=True, no_store=True)
+@cache_control(private=True, no_cache=True, must_revalidate=True)
+@conditional_on_data_version
 def index(request):
-    user_preferences, created = UserPreferences.objects.get_or_create(user=request.user)
+    user_preferences = get_user_preferences(request)
     categories = user_preferences.categories_expenses
     accounts = user_preferences.accounts
     search_text = request.GET.get('search', '')  # Capture searchText from query parameters
 
     # Determine the base queryset depending on ownership filter
-    expenses = Expense.objects.filter(owner=request.user)
+    expenses = Expense.objects.filter(owner=request.user).select_related('owner')
 
-    # Apply filtering if searchText is present
+    # Typed predicates plus an indexed full-text match on the description
     if search_text:
-        expenses = expenses.filter(
-            Q(amount__icontains=search_text) |
-            Q(date__icontains=search_text) |
-            Q(description__icontains=search_text) |
-            Q(category__icontains=search_text) |
-            Q(account__icontains=search_text)
-        )
-
-    expenses = expenses.order_by('-date')
-    
-    paginator = Paginator(expenses, user_preferences.rows_per_page)
-    page_number = request.GET.get('page', 1)
-    page_obj = paginator.get_page(page_number)
-    
+        expenses = apply_search(expenses, search_text, categories, accounts)
+
+    page_obj = keyset_page(expenses, request.GET.get('cursor', ''), user_preferences.rows_per_page)
+    total_count = cached_count(expenses, request.user.id, get_data_version(request)[0], search_text)
+
     context = {
         'categories': categories,
         'accounts': accounts,
-        'expenses': expenses,
         'user_preferences': user_preferences,
         'page_obj': page_obj,
+        'total_count': total_count,
+        'bulk_limit': BULK_ACTION_LIMIT,
         'search_text': search_text
     }
     return render(request, 'expenses/expenses.html', context)
@@ -59,7 +61,7 @@ def index(request):
 @login_required(login_url='/authentication/login')
 @cache_control(no_cache=True, must_revalidate=True, no_store=True)
 def add_expense(request):
-    user_preferences, created = UserPreferences.objects.get_or_create(user=request.user)
+    user_preferences = get_user_preferences(request)
     categories = user_preferences.categories_expenses
     accounts = user_preferences.accounts
     context = {
@@ -93,27 +95,30 @@ def add_expense(request):
             messages.error(request, 'All fields are mandatory')
             return render(request, 'expenses/add_expense.html', context)
 
-        Expense.objects.create(
-            owner=request.user,
-            date=date,
-            description=description,
-            amount=amount_decimal,
-            category=category,
-            account=account
-        )
-
-        balance, created = Balance.objects.get_or_create(user=request.user)
-        balance.update_balance(request)
+        with transaction.atomic():
+            expense = Expense.objects.create(
+                owner=request.user,
+                date=date,
+                description=description,
+                amount=amount_decimal,
+                category=category,
+                account=account,
+                currency=user_preferences.currency_code
+            )
+            MonthlyRollup.record([expense])
+            Budget.apply_expense(request.user, category, date, amount_decimal)
+            Balance.apply_delta(request.user, expenses=amount_decimal)
 
         messages.success(request, 'Expense added successfully')
+        warn_over_budget(request, category)
         return redirect('expenses')
     
 
 @login_required(login_url='/authentication/login')
 @cache_control(no_cache=True, must_revalidate=True, no_store=True)
 def edit_expense(request, id):
-    expense=Expense.objects.get(pk=id)
-    user_preferences, created = UserPreferences.objects.get_or_create(user=request.user)
+    expense = Expense.objects.get(pk=id, owner=request.user)
+    user_preferences = get_user_preferences(request)
     categories = user_preferences.categories_expenses
     accounts = user_preferences.accounts
     context = {
@@ -148,26 +153,42 @@ def edit_expense(request, id):
             messages.error(request, 'All fields are mandatory')
             return render(request, 'expenses/edit_expense.html', context)
 
-        expense.owner=request.user
-        expense.date=date
-        expense.description=description
-        expense.amount=amount_decimal
-        expense.category=category
-        expense.account=account
-        expense.save()
-
-        balance, created = Balance.objects.get_or_create(user=request.user)
-        balance.update_balance(request)
+        # Balance deltas are in the display currency; the row keeps its own
+        currency = user_preferences.currency_code
+        try:
+            with transaction.atomic():
+                # Lock the row so a concurrent edit cannot change what the delta is taken from
+                expense = Expense.objects.select_for_update().get(pk=expense.pk, owner=request.user)
+                previous_amount = rates.convert(expense.amount, expense.currency, currency, expense.date)
+                previous_category, previous_date = expense.category, expense.date
+                MonthlyRollup.record([expense], sign=-1)
+                expense.owner=request.user
+                expense.date=date
+                expense.description=description
+                expense.amount=amount_decimal
+                expense.category=category
+                expense.account=account
+                expense.save()
+                MonthlyRollup.record([expense])
+                new_amount = rates.convert(amount_decimal, expense.currency, currency, datetime.date.fromisoformat(date))
+                Budget.apply_expense(request.user, previous_category, previous_date, -previous_amount)
+                Budget.apply_expense(request.user, category, date, new_amount)
+                Balance.apply_delta(request.user, expenses=new_amount - previous_amount)
+        except MissingRate as error:
+            messages.error(request, f'{error}, import exchange rates before editing this expense')
+            return render(request, 'expenses/edit_expense.html', context)
 
         messages.success(request, 'Expense updated successfully')
+        warn_over_budget(request, category)
         return redirect('expenses')
     
 
 @login_required(login_url='/authentication/login')
-@cache_control(no_cache=True, must_revalidate=True, no_store=True)
+@cache_control(private=True, no_cache=True, must_revalidate=True)
+@conditional_on_data_version
 def expenses_summary(request):
     intervals = list(DEFAULT_DAYS_IN_TIME_INTERVALS.keys())
-    return render(request, 'expenses/expenses_summary.html', {"intervals": intervals})
+    return render(request, 'expenses/expenses_summary.html', {"intervals": intervals, "periods": CALENDAR_PERIODS})
 
 
 #########################################################
@@ -177,11 +198,20 @@ def expenses_summary(request):
 @login_required(login_url='/authentication/login')
 @cache_control(no_cache=True, must_revalidate=True, no_store=True)
 def delete_expense(request, id):
-    expense = Expense.objects.get(pk=id)
-    expense.delete()
-
-    balance, created = Balance.objects.get_or_create(user=request.user)
-    balance.update_balance(request)
+    expense = Expense.objects.get(pk=id, owner=request.user)
+    currency = get_user_preferences(request).currency_code
+    try:
+        with transaction.atomic():
+            expense = Expense.objects.select_for_update().get(pk=expense.pk, owner=request.user)
+            DeletedTransaction.record([expense])
+            expense.delete()
+            MonthlyRollup.record([expense], sign=-1)
+            amount = rates.convert(expense.amount, expense.currency, currency, expense.date)
+            Budget.apply_expense(request.user, expense.category, expense.date, -amount)
+            Balance.apply_delta(request.user, expenses=-amount)
+    except MissingRate as error:
+        messages.error(request, f'{error}, import exchange rates before deleting this expense')
+        return redirect('expenses')
 
     messages.success(request, 'Expense deleted successfully')
     return redirect('expenses')
@@ -189,41 +219,111 @@ def delete_expense(request, id):
 
 @login_required(login_url='/authentication/login')
 @cache_control(no_cache=True, must_revalidate=True, no_store=True)
-def get_expenses_by_category(request, interval, calculation_type="total"):
-    today = datetime.date.today()
-    delta_days = DEFAULT_DAYS_IN_TIME_INTERVALS[interval]
-    start_date = today - datetime.timedelta(days=delta_days)
-
-    expenses = Expense.objects.filter(owner=request.user, date__gte=start_date, date__lte=today)
-
-    result = {}
-
-    def get_category(expense):
-        return expense.category
+def bulk_expenses(request):
+    """Delete or recategorize the selected expenses, or every one matching the search, in one request."""
+    if request.method != 'POST':
+        return redirect('expenses')
 
-    category_list = list(set(map(get_category, expenses)))
+    user_preferences = get_user_preferences(request)
+    categories = user_preferences.categories_expenses
+    search_text = request.POST.get('search', '')
+    back = reverse('expenses') + (f'?{urlencode({"search": search_text})}' if search_text else '')
+
+    action = request.POST.get('action')
+    category = request.POST.get('category', '')
+    if action not in ('delete', 'recategorize'):
+        messages.error(request, 'Unknown action')
+        return redirect(back)
+    if action == 'recategorize' and category not in categories:
+        messages.error(request, 'Select a category')
+        return redirect(back)
+
+    if request.POST.get('scope') == 'matching':
+        if not search_text.strip():
+            messages.error(request, 'Search first to act on every matching expense')
+            return redirect(back)
+        expenses = apply_search(Expense.objects.filter(owner=request.user), search_text, categories,
+                                user_preferences.accounts)
+        if action == 'recategorize':
+            # Rows moved by an earlier, truncated run are not picked again
+            expenses = expenses.exclude(category=category)
+        ids = list(expenses.order_by('-date', '-id').values_list('id', flat=True)[:BULK_ACTION_LIMIT + 1])
+    else:
+        ids = [parse_id(id) for id in request.POST.getlist('ids')]
+        if None in ids:
+            return HttpResponseBadRequest('Invalid expense id')
+    if not ids:
+        messages.error(request, 'No expenses selected')
+        return redirect(back)
+    truncated = len(ids) > BULK_ACTION_LIMIT
+    ids = ids[:BULK_ACTION_LIMIT]
+
+    currency = user_preferences.currency_code
+    if action == 'delete':
+        try:
+            count = bulk_delete(request.user, 'expense', ids, currency)
+        except MissingRate as error:
+            messages.error(request, f'{error}, import exchange rates before deleting these expenses')
+            return redirect(back)
+        messages.success(request, f'{count} expense{"s" if count != 1 else ""} deleted successfully')
+    else:
+        count = bulk_recategorize(request.user, 'expense', ids, category, currency)
+        messages.success(request, f'{count} expense{"s" if count != 1 else ""} moved to {category}')
+    if truncated:
+        messages.warning(request, f'Only {BULK_ACTION_LIMIT} expenses are changed at a time, '
+                                  'run the action again for the rest')
+    return redirect(back)
 
-    def calculate_total(category):
-        return expenses.filter(category=category).aggregate(total_amount=Sum('amount'))['total_amount'] or 0
 
-    def calculate_mean(category):
-        return expenses.filter(category=category).aggregate(mean_amount=Avg('amount'))['mean_amount'] or 0
+@login_required(login_url='/authentication/login')
+@cache_control(private=True, no_cache=True, must_revalidate=True)
+@conditional_on_data_version
+def get_expenses_by_category(request, interval):
+    calculation_type = request.GET.get('calculation_type', 'total')
+    period = resolve_period(interval, request.GET)
+    if period is None:
+        return JsonResponse({'error': f'Unknown or invalid period: {interval}'}, status=400)
+    start_date, end_date = period
+    currency = get_user_preferences(request).currency_code
+    data_version = get_data_version(request)[0]
+
+    summary = category_summary(request.user, 'expense', start_date, end_date, currency, data_version)
+    response = {
+        'expenses_by_category': select_calculation(summary, calculation_type),
+        'incomplete': incomplete_categories(summary),
+        'start': start_date,
+        'end': end_date,
+    }
 
-    def calculate_proportion(category):
-        total_expense = expenses.aggregate(total=Sum('amount'))['total'] or 1
-        category_total = calculate_total(category)
-        return (category_total / total_expense) * 100 if total_expense > 0 else 0
+    compare = request.GET.get('compare')
+    if compare in COMPARISONS:
+        compare_start, compare_end = comparison_period(start_date, end_date, compare)
+        summary = category_summary(request.user, 'expense', compare_start, compare_end, currency, data_version)
+        response['comparison'] = {
+            'expenses_by_category': select_calculation(summary, calculation_type),
+            'incomplete': incomplete_categories(summary),
+            'start': compare_start,
+            'end': compare_end,
+        }
 
-    calculation_function_map = {
-        "total": calculate_total,
-        "mean": calculate_mean,
-        "proportions": calculate_proportion,
-    }
+    return JsonResponse(response, safe=False)
 
-    calculation_function = calculation_function_map.get(calculation_type, calculate_total)
 
-    for c in category_list:
-        result[c] = calculation_function(c)
+@login_required(login_url='/authentication/login')
+@cache_control(private=True, no_cache=True, must_revalidate=True)
+@conditional_on_data_version
+def get_expenses_series(request, interval):
+    period = resolve_period(interval, request.GET)
+    if period is None:
+        return JsonResponse({'error': f'Unknown or invalid period: {interval}'}, status=400)
+    start_date, end_date = period
+    granularity = request.GET.get('granularity')
+    if granularity not in GRANULARITIES:
+        granularity = default_granularity(start_date, end_date)
 
-    return JsonResponse({'expenses_by_category': result}, safe=False)
+    expenses = Expense.objects.filter(owner=request.user)
+    labels, series = time_series(expenses, granularity, start_date, end_date,
+                                 get_user_preferences(request).currency_code,
+                                 by_category=request.GET.get('by_category') == '1')
 
+    return JsonResponse({'granularity': granularity, 'labels': labels, 'series': series})
@@ -0,0 +1,57 @@
+# Full-text index on the description column. PostgreSQL gets a GIN index on
+# the tsvector expression used by balance.search; SQLite gets an FTS5 table
+# kept in sync with triggers.
+
+from django.db import migrations
+
+TABLE = 'incomes_income'
+
+POSTGRESQL_FORWARDS = [
+    f"CREATE INDEX income_description_fts_idx ON {TABLE} USING GIN (to_tsvector('simple', description))",
+]
+POSTGRESQL_BACKWARDS = [
+    'DROP INDEX IF EXISTS income_description_fts_idx',
+]
+
+SQLITE_FORWARDS = [
+    f"CREATE VIRTUAL TABLE {TABLE}_fts USING fts5(description, content='{TABLE}', content_rowid='id')",
+    f"""CREATE TRIGGER {TABLE}_fts_insert AFTER INSERT ON {TABLE} BEGIN
+        INSERT INTO {TABLE}_fts(rowid, description) VALUES (new.id, new.description);
+    END""",
+    f"""CREATE TRIGGER {TABLE}_fts_delete AFTER DELETE ON {TABLE} BEGIN
+        INSERT INTO {TABLE}_fts({TABLE}_fts, rowid, description) VALUES ('delete', old.id, old.description);
+    END""",
+    f"""CREATE TRIGGER {TABLE}_fts_update AFTER UPDATE ON {TABLE} BEGIN
+        INSERT INTO {TABLE}_fts({TABLE}_fts, rowid, description) VALUES ('delete', old.id, old.description);
+        INSERT INTO {TABLE}_fts(rowid, description) VALUES (new.id, new.description);
+    END""",
+    f"INSERT INTO {TABLE}_fts({TABLE}_fts) VALUES ('rebuild')",
+]
+SQLITE_BACKWARDS = [
+    f'DROP TRIGGER IF EXISTS {TABLE}_fts_insert',
+    f'DROP TRIGGER IF EXISTS {TABLE}_fts_delete',
+    f'DROP TRIGGER IF EXISTS {TABLE}_fts_update',
+    f'DROP TABLE IF EXISTS {TABLE}_fts',
+]
+
+
+def run_for_vendor(postgresql, sqlite):
+    def run(apps, schema_editor):
+        statements = {'postgresql': postgresql, 'sqlite': sqlite}.get(schema_editor.connection.vendor, [])
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('incomes', '0004_owner_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_for_vendor(POSTGRESQL_FORWARDS, SQLITE_FORWARDS),
+            run_for_vendor(POSTGRESQL_BACKWARDS, SQLITE_BACKWARDS),
+        ),
+    ]
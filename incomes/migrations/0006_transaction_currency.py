@@ -0,0 +1,30 @@
+# Generated by Django 5.0.7 on 2026-10-18 13:18
+
+from django.db import migrations, models
+
+
+def backfill_currency(apps, schema_editor):
+    # Existing rows were entered in whatever currency their owner displays today
+    UserPreferences = apps.get_model('userpreferences', 'UserPreferences')
+    Income = apps.get_model('incomes', 'Income')
+    for currency_code in UserPreferences.objects.values_list('currency_code', flat=True).distinct():
+        Income.objects.filter(
+            currency__isnull=True, owner__userpreferences__currency_code=currency_code,
+        ).update(currency=currency_code)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('incomes', '0005_description_search_index'),
+        ('userpreferences', '0009_alter_userpreferences_accounts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='income',
+            name='currency',
+            field=models.CharField(blank=True, max_length=10, null=True),
+        ),
+        migrations.RunPython(backfill_currency, migrations.RunPython.noop),
+    ]
@@ -11,12 +11,37 @@ class Income(models.Model):
     owner = models.ForeignKey(to=User, on_delete=models.CASCADE)
     category = models.CharField(max_length=255)
     account = models.CharField(max_length=255)
+    currency = models.CharField(max_length=10, null=True, blank=True)
+    # Set on rows generated from a rule; the partial unique index below covers lookups by it
+    recurring_rule = models.ForeignKey('balance.RecurringRule', null=True, blank=True,
+                                       on_delete=models.SET_NULL, db_index=False)
+    # When the row was last written, for clients; null only on rows that predate it
+    updated_at = models.DateTimeField(auto_now=True, null=True)
+    # Delta sync cursor: the owner's data version of the commit that last wrote
+    # the row, set by balance.models.stamp_sync_versions; null until then
+    sync_version = models.PositiveBigIntegerField(null=True, blank=True)
+
+    def save(self, *args, **kwargs):
+        # Pending again until the writing transaction stamps it
+        self.sync_version = None
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.category
     
     class Meta:
         ordering = ['-date']
+        indexes = [
+            models.Index(fields=['owner', '-date', '-id'], name='income_owner_date_idx'),
+            models.Index(fields=['owner', 'category', 'date'], name='income_owner_cat_date_idx'),
+            models.Index(fields=['owner', 'account'], name='income_owner_account_idx'),
+            models.Index(fields=['owner', 'sync_version', 'id'], name='income_owner_sync_idx'),
+            models.Index(fields=['owner'], condition=models.Q(sync_version__isnull=True), name='income_unsynced_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['recurring_rule', 'date'], condition=models.Q(recurring_rule__isnull=False),
+                                    name='unique_income_occurrence'),
+        ]
 
 class Category(models.Model):
     name = models.CharField(max_length=255)
@@ -6,8 +6,10 @@ urlpatterns = [
     path('add-income', views.add_income, name='add-incomes'),
     path('edit-income/<int:id>', views.edit_income, name='edit-income'), 
     path('delete-income/<int:id>', views.delete_income, name='delete-income'),
+    path('bulk-incomes', views.bulk_incomes, name='bulk-incomes'),
     path('incomes-summary', views.incomes_summary, name='incomes-summary'),
     
     #Endpoints
     path('get_incomes_by_category/<str:interval>', views.get_incomes_by_category, name='get_incomes_by_category'),
+    path('get_incomes_series/<str:interval>', views.get_incomes_series, name='get_incomes_series'),
 ]
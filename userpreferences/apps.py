@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class UserpreferencesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'userpreferences'
+
+    def ready(self):
+        # Parse currencies.json once at startup instead of on every request
+        from . import currencies
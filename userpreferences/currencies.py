@@ -0,0 +1,114 @@
+import bisect
+import json
+import os
+import time
+import uuid
+from decimal import Decimal
+from types import MappingProxyType
+from django.conf import settings
+from django.core.cache import cache
+from .models import ExchangeRate
+
+PIVOT_CURRENCY = 'EUR'
+RATE_CACHE_TIMEOUT = 60 * 60
+# Rates are reloaded when this shared key changes, looked up at most this often
+RATES_VERSION_KEY = 'exchange_rates:version'
+RATES_VERSION_CHECK_INTERVAL = 1
+
+
+def load_currencies():
+    with open(os.path.join(settings.BASE_DIR, 'currencies.json'), 'r') as json_file:
+        return MappingProxyType(json.load(json_file))
+
+
+# Currency code -> name, read once per process
+CURRENCIES = load_currencies()
+
+
+class MissingRate(Exception):
+    def __init__(self, base, quote, date):
+        super().__init__(f'No exchange rate from {base} to {quote} on {date}')
+        self.base, self.quote, self.date = base, quote, date
+
+
+class RateCache:
+    """
+    In-memory, date-indexed exchange rates. Each currency pair is loaded with
+    one query and kept for RATE_CACHE_TIMEOUT seconds, or until an import
+    publishes a new rates version in the shared cache; lookups after that
+    are a bisect over the pair's sorted dates.
+    """
+
+    def __init__(self):
+        self.pairs = {}
+        self.version = None
+        self.version_checked = 0
+
+    def clear(self):
+        self.pairs = {}
+
+    @staticmethod
+    def publish():
+        """Make every process drop its rates within RATES_VERSION_CHECK_INTERVAL. Call it after an import."""
+        cache.set(RATES_VERSION_KEY, uuid.uuid4().hex, None)
+
+    def check_version(self):
+        now = time.monotonic()
+        if now - self.version_checked < RATES_VERSION_CHECK_INTERVAL:
+            return
+        self.version_checked = now
+        version = cache.get(RATES_VERSION_KEY)
+        if version != self.version:
+            self.version = version
+            self.clear()
+
+    def load_pair(self, base, quote):
+        self.check_version()
+        entry = self.pairs.get((base, quote))
+        if entry is None or time.monotonic() - entry[0] > RATE_CACHE_TIMEOUT:
+            rows = list(ExchangeRate.objects.filter(base=base, quote=quote).order_by('date').values_list('date', 'rate'))
+            entry = (time.monotonic(), [row[0] for row in rows], [row[1] for row in rows])
+            self.pairs[(base, quote)] = entry
+        return entry
+
+    def lookup(self, base, quote, date):
+        """Latest rate on or before `date`, or the earliest one if `date` predates them all."""
+        loaded_at, dates, rates = self.load_pair(base, quote)
+        if not dates:
+            return None
+        index = bisect.bisect_right(dates, date) - 1
+        return rates[max(index, 0)]
+
+    def rate(self, base, quote, date):
+        if base == quote:
+            return Decimal('1')
+
+        direct = self.lookup(base, quote, date)
+        if direct is not None:
+            return direct
+        inverse = self.lookup(quote, base, date)
+        if inverse:
+            return 1 / inverse
+
+        if PIVOT_CURRENCY not in (base, quote):
+            to_pivot = self.rate(base, PIVOT_CURRENCY, date)
+            from_pivot = self.rate(PIVOT_CURRENCY, quote, date)
+            if to_pivot is not None and from_pivot is not None:
+                return to_pivot * from_pivot
+        return None
+
+    def convert(self, amount, base, quote, date):
+        """
+        Convert an amount. Rows without a currency predate conversion and are
+        taken as already in `quote`; raises MissingRate when no rate links
+        the two currencies, so amounts are never mixed silently.
+        """
+        if not base or base == quote:
+            return amount
+        rate = self.rate(base, quote, date)
+        if rate is None:
+            raise MissingRate(base, quote, date)
+        return (amount * rate).quantize(Decimal('0.01'))
+
+
+rates = RateCache()
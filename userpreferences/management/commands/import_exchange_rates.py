@@ -0,0 +1,72 @@
+import csv
+import datetime
+import time
+from decimal import Decimal, InvalidOperation
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from userpreferences.currencies import RATES_VERSION_CHECK_INTERVAL, rates
+from userpreferences.models import ExchangeRate, DataVersion
+from balance.budgets import refresh_all_budgets
+from balance.reconcile import reconcile_balances
+
+
+class Command(BaseCommand):
+    help = 'Load daily exchange rates from a CSV with date, base, quote and rate columns'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        imported = 0
+        batch = []
+
+        def flush():
+            ExchangeRate.objects.bulk_create(
+                batch, update_conflicts=True,
+                unique_fields=['base', 'quote', 'date'], update_fields=['rate'],
+            )
+            batch.clear()
+
+        try:
+            with open(options['path'], newline='') as csv_file, transaction.atomic():
+                for row in csv.DictReader(csv_file):
+                    try:
+                        batch.append(ExchangeRate(
+                            date=datetime.date.fromisoformat(row['date'].strip()),
+                            base=row['base'].strip().upper(),
+                            quote=row['quote'].strip().upper(),
+                            rate=Decimal(row['rate'].strip()),
+                        ))
+                    except (KeyError, ValueError, InvalidOperation, AttributeError):
+                        raise CommandError(f'Invalid row: {row}')
+                    imported += 1
+                    if len(batch) >= batch_size:
+                        flush()
+                flush()
+        except OSError as error:
+            raise CommandError(error)
+
+        # Every process drops its cached rates; this one at once
+        rates.publish()
+        published = time.monotonic()
+        rates.clear()
+
+        # Stored totals were converted at the old rates, or left out without one
+        changes, unconverted = reconcile_balances()
+        budget_users = refresh_all_budgets()
+
+        # Only once every worker has seen the new rates, or it could cache
+        # figures at the old ones under the new data version
+        time.sleep(max(0, RATES_VERSION_CHECK_INTERVAL - (time.monotonic() - published)))
+        DataVersion.bump_all()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {imported} exchange rates, corrected {len(changes)} balances '
+            f'and refreshed the budgets of {budget_users} users'
+        ))
+        if unconverted:
+            self.stdout.write(self.style.WARNING(
+                f"Users {', '.join(map(str, unconverted))} still have rows without an exchange rate "
+                "to their currency"))
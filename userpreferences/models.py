@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import models, transaction, IntegrityError
+from django.db.models import F
+from django.utils import timezone
 from django.contrib.auth.models import User
 
 # Default values as callables
@@ -21,5 +23,75 @@ class UserPreferences(models.Model):
     categories_expenses = models.JSONField(default=get_default_categories_expenses)
     accounts = models.JSONField(default=get_default_accounts)
 
+    # Cached copies are keyed by the data version, so the bump retires them in every process
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        DataVersion.bump(self.user_id)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        DataVersion.bump(self.user_id)
+        return result
+
     def __str__(self):
         return f"{self.user.username}'s preferences"
+
+
+def preferences_cache_key(user_id, version):
+    return f'userpreferences:{user_id}:{version}'
+
+
+class DataVersion(models.Model):
+    """
+    Counter bumped on every write to a user's transactions or preferences.
+    Views derive their ETag and Last-Modified from it, so a repeat request
+    is answered with one primary key lookup.
+    """
+    user = models.OneToOneField(to=User, on_delete=models.CASCADE, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+    modified = models.DateTimeField(default=timezone.now)
+
+    @classmethod
+    def bump(cls, user_id):
+        """Call it inside the transaction of the write it accounts for."""
+        updated = cls.objects.filter(user_id=user_id).update(version=F('version') + 1, modified=timezone.now())
+        if updated:
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(user_id=user_id, version=1)
+        except IntegrityError:
+            # Created concurrently since the UPDATE above
+            cls.objects.filter(user_id=user_id).update(version=F('version') + 1, modified=timezone.now())
+
+    @classmethod
+    def bump_many(cls, user_ids):
+        user_ids = set(user_ids)
+        cls.objects.filter(user_id__in=user_ids).update(version=F('version') + 1, modified=timezone.now())
+        existing = set(cls.objects.filter(user_id__in=user_ids).values_list('user_id', flat=True))
+        cls.objects.bulk_create([cls(user_id=user_id, version=1) for user_id in user_ids - existing],
+                                ignore_conflicts=True)
+
+    @classmethod
+    def bump_all(cls):
+        """For writes that change every user's figures, such as new exchange rates."""
+        cls.objects.update(version=F('version') + 1, modified=timezone.now())
+
+    def __str__(self):
+        return f"{self.user_id} v{self.version}"
+
+
+class ExchangeRate(models.Model):
+    """Daily rate to convert one unit of `base` into `quote`."""
+    date = models.DateField()
+    base = models.CharField(max_length=10)
+    quote = models.CharField(max_length=10)
+    rate = models.DecimalField(max_digits=18, decimal_places=8)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['base', 'quote', 'date'], name='unique_exchange_rate'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.base}/{self.quote} {self.rate}"
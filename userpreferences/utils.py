@@ -0,0 +1,78 @@
+import datetime
+import hashlib
+from django.contrib import messages
+from django.core.cache import cache
+from django.views.decorators.http import condition
+from .models import UserPreferences, DataVersion, preferences_cache_key
+
+PREFERENCES_CACHE_TIMEOUT = 60 * 5
+
+
+def get_user_preferences(request):
+    """
+    The requesting user's preferences, read at most once per request and
+    served from the cache across requests. The cache key carries the user's
+    data version, which every save bumps, so no process can serve a copy
+    older than the last save even with a per-process cache. The row is only
+    created on a user's first access.
+    """
+    preferences = getattr(request, '_cached_user_preferences', None)
+    if preferences is not None:
+        return preferences
+
+    key = preferences_cache_key(request.user.id, get_data_version(request)[0])
+    preferences = cache.get(key)
+    if preferences is None:
+        preferences, created = UserPreferences.objects.get_or_create(user=request.user)
+        cache.set(key, preferences, PREFERENCES_CACHE_TIMEOUT)
+
+    request._cached_user_preferences = preferences
+    return preferences
+
+
+def get_user_preferences_for_update(request):
+    """
+    A fresh copy of the requesting user's preferences, locked until the end
+    of the surrounding transaction, for read-modify-write updates that must
+    not save over a concurrent change.
+    """
+    get_user_preferences(request)
+    preferences = UserPreferences.objects.select_for_update().get(user=request.user)
+    request._cached_user_preferences = preferences
+    return preferences
+
+
+def get_data_version(request):
+    """(version, modified) of the requesting user's data, read once per request."""
+    data_version = getattr(request, '_cached_data_version', None)
+    if data_version is None:
+        data_version = DataVersion.objects.filter(user=request.user).values_list('version', 'modified').first()
+        data_version = data_version or (0, None)
+        request._cached_data_version = data_version
+    return data_version
+
+
+def has_pending_messages(request):
+    # len() peeks without marking them as shown
+    return len(messages.get_messages(request)) > 0
+
+
+def data_etag(request, *args, **kwargs):
+    # A flash message queued by the previous redirect must be rendered, not skipped by a 304
+    if has_pending_messages(request):
+        return None
+    # Relative intervals ("last 30 days") move with the date even without
+    # writes, and a rotated CSRF token must not be served from a stale page
+    version = get_data_version(request)[0]
+    key = f"{request.user.id}:{version}:{datetime.date.today().isoformat()}:{request.META.get('CSRF_COOKIE', '')}"
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+def data_last_modified(request, *args, **kwargs):
+    if has_pending_messages(request):
+        return None
+    return get_data_version(request)[1]
+
+
+# Answers 304 Not Modified for GET/HEAD when the user's data has not changed
+conditional_on_data_version = condition(etag_func=data_etag, last_modified_func=data_last_modified)